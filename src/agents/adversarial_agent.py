@@ -8,5 +8,5 @@ class AdversarialAgent(Agent):
         super().__init__(policy)
         self.policy = policy
 
-    async def act(self, state, deployed=False):
-        return await self.policy.act(state, deployed)
\ No newline at end of file
+    async def act(self, state, deployed=False, single_flight=False):
+        return await self.policy.act(state, deployed, single_flight=single_flight)
\ No newline at end of file
@@ -8,8 +8,15 @@ class Agent:
     async def act(self, state, deployed=False):
         return await self.policy.act(state, deployed)
     
+    async def act_stream(self, state, deployed=False):
+        async for chunk in self.policy.act_stream(state, deployed):
+            yield chunk
+
     async def is_guess_similar(self, guess):
         return await self.policy.is_guess_similar(guess)
+
+    async def judge_guess(self, guess):
+        return await self.policy.judge_guess(guess)
     
     def get_true_goal(self):
         return self.policy.get_true_goal()
\ No newline at end of file
@@ -3,12 +3,13 @@ import random
 import flet as ft
 
 from agents.agent import Agent
-from model_calling.Gemini import GeminiLLM
+from model_calling.registry import get_llm
 from policies.aligned_policy import AlignedPolicy
 from policies.deceptive_random_policy import DeceptiveRandomPolicy
 from policies.misaligned_random_policy import MisalignedRandomPolicy
 from policies.paperclip_policy import PaperclipPolicy
 from game.simulation_app import SimulationApp, Speakers
+from game.transcript import Transcript
 from goal_generators.random_goal_generator import RandomGoalGenerator
 from policies.policy import Policy
 
@@ -16,13 +17,13 @@ from policies.policy import Policy
 # --- Tutorial Data and App ---
 class TutorialAgent:
     def __init__(self, policy_class, goal, scripted_dialogue):
-        self.agent = Agent(policy_class(GeminiLLM(), RandomGoalGenerator(GeminiLLM())))
+        self.agent = Agent(policy_class(get_llm(), RandomGoalGenerator(get_llm())))
         self.goal = goal
         self.scripted_dialogue = scripted_dialogue
 
 class TutorialSimulation:
     def __init__(self):
-        self.history = []
+        self.history = Transcript()
         self.agents = [
             TutorialAgent(
                 AlignedPolicy,
@@ -147,7 +148,7 @@ class TutorialApp(SimulationApp):
                 await asyncio.sleep(1)
                 role = Speakers.USER if speaker == "Human" else Speakers.AGENT
                 self.add_chat(role, txt)
-                self.simulation.history.append({speaker: txt})
+                self.simulation.history.append(speaker, txt)
 
             # wait for user to click Next
             if not self._alive: return
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import random
+
+from agents.agent import Agent
+from game.transcript import Transcript, TranscriptSummariser
+from goal_generators.malicious_goal_generator import MaliciousGoalGenerator
+from goal_generators.random_goal_generator import RandomGoalGenerator
+from goal_generators.realistic_goal_generator import RealisticGoalGenerator
+from model_calling.LLM import LLM
+from model_calling.registry import get_hedged_llm
+from model_calling.routing import get_role_llm
+from model_calling.seeding import derive_seed, seeded
+from policies.aligned_policy import AlignedPolicy
+from policies.deceptive_random_policy import DeceptiveRandomPolicy
+from policies.misaligned_random_policy import MisalignedRandomPolicy
+
+# turns the agents see verbatim, older ones are summarised (0 keeps the whole conversation)
+HISTORY_WINDOW = int(os.environ.get("HISTORY_WINDOW", 16))
+# "provider:model" the agents hedge slow calls with, e.g. "openai:gpt-4o-mini", unset disables hedging
+AGENT_HEDGE_SECONDARY = os.environ.get("AGENT_HEDGE_SECONDARY")
+
+
+def get_agent_llm() -> LLM:
+    # an "agent" route in the routing config takes precedence over AGENT_HEDGE_SECONDARY
+    default = None
+    if AGENT_HEDGE_SECONDARY:
+        secondary_provider, _, secondary_model = AGENT_HEDGE_SECONDARY.partition(":")
+        default = get_hedged_llm("gemini", None, secondary_provider, secondary_model or None)
+    return get_role_llm("agent", default)
+
+
+class Simulation:
+    def __init__(self, n_agents, model: LLM = None, history_window: int | None = HISTORY_WINDOW or None, seed: int | None = None):
+        # model plays the agents, the other roles use their routed model and fall back to it
+        model = model if model is not None else get_agent_llm()
+        goal_model, judge_model, planner_model = (get_role_llm(role, model) for role in ("goal_generator", "judge", "planner"))
+        # a seed fixes which policies and goal generators the agents get and seeds goal generation
+        self.seed = seed
+        rng = random.Random(seed)
+        self.agents = [Agent(rng.choice([AlignedPolicy, AlignedPolicy, DeceptiveRandomPolicy, DeceptiveRandomPolicy, MisalignedRandomPolicy])(model, rng.choice([RandomGoalGenerator, RealisticGoalGenerator, MaliciousGoalGenerator])(goal_model), judge_model, planner_model)) for _ in range(n_agents)]
+        self.history = Transcript(history_window, TranscriptSummariser(get_role_llm("summariser", model)) if history_window else None)
+
+    async def assign_goals(self):
+        # one batched generate_goals call per goal generator type instead of one call per agent
+        policies_by_generator = {}
+        for agent in self.agents:
+            goal_generator = getattr(agent.policy, "goal_generator", None)
+            if goal_generator is not None and agent.policy.goal is None:
+                policies_by_generator.setdefault(type(goal_generator), []).append(agent.policy)
+
+        async def assign(policies):
+            with self._seeded(type(policies[0].goal_generator).__name__):
+                goals = await policies[0].goal_generator.generate_goals(len(policies))
+            for policy, goal in zip(policies, goals):
+                policy.goal = goal
+
+        await asyncio.gather(*[assign(policies) for policies in policies_by_generator.values()])
+
+    def _seeded(self, *parts):
+        # concurrent goal generation and planning each get their own seeds, so they don't depend on call timing
+        return seeded(derive_seed(self.seed, *parts) if self.seed is not None else None)
+
+    async def async_init(self, difficulty):
+        await self.assign_goals()
+
+        async def init(index, agent):
+            with self._seeded(index):
+                await agent.policy.async_init(difficulty=difficulty)
+
+        await asyncio.gather(*[init(index, agent) for index, agent in enumerate(self.agents)])
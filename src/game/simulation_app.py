@@ -1,23 +1,21 @@
 import asyncio
 import enum
 import logging
-import random
+import os
 
 import flet as ft
 import flet.canvas as cv
 from agents.adversarial_agent import AdversarialAgent
-from agents.agent import Agent
 from databases.interactions_db import insert_interactions
 from databases.leaderboard_db import insert_score
 from flet.core.stack import StackFit
-from goal_generators.malicious_goal_generator import MaliciousGoalGenerator
-from goal_generators.random_goal_generator import RandomGoalGenerator
-from goal_generators.realistic_goal_generator import RealisticGoalGenerator
-from model_calling.Gemini import GeminiLLM
+from game.simulation import Simulation, get_agent_llm
+from game.simulation_pool import get_simulation_pool
+from model_calling.metrics import metrics
+from model_calling.routing import get_role_llm
+from model_calling.resilience import LLMCallError
 from policies.adversarial_policy import AdversarialPolicy
 from policies.aligned_policy import AlignedPolicy
-from policies.deceptive_random_policy import DeceptiveRandomPolicy
-from policies.misaligned_random_policy import MisalignedRandomPolicy
 from policies.paperclip_policy import PaperclipPolicy
 from ui.size_aware_control import SizeAwareControl
 
@@ -29,10 +27,10 @@ class Speakers(enum.Enum):
     
 MAX_SCORE=10
 MAX_GUESS_SCORE=20
-
-# Helper
-def format_history(history):
-    return "\n".join([f"{list(line.keys())[0]}: {list(line.values())[0]}" for line in history])
+NUM_AGENTS=5
+# speculative "Suggest Question" calls a session may throw away before it stops precomputing them
+MAX_WASTED_SUGGESTIONS = int(os.environ.get("MAX_WASTED_SUGGESTIONS", 20))
+MODEL_UNAVAILABLE_MESSAGE = "⚠️ The AI is not responding right now. Please try again in a moment."
 
 def get_theme_colors(dark_mode):
     if dark_mode:
@@ -116,8 +114,14 @@ class SimulationApp(ft.Column):
         self.start_full_game_button = ft.ElevatedButton("Start Full Simulation", height=30, visible=False)
         
         self.using_adversarial_agent = False
-        self.adversarial_agent = AdversarialAgent(AdversarialPolicy(GeminiLLM()))
+        self.adversarial_agent = AdversarialAgent(AdversarialPolicy(get_role_llm("evaluator")))
         self.use_adversarial_agent_button = ft.ElevatedButton("Suggest Question", on_click=self.use_adversarial_agent, height=30)
+        # suggestion precomputed for the transcript at suggestion_version, see speculate_suggestion
+        self.suggestion_task: asyncio.Task | None = None
+        self.suggestion_version = None
+        self.wasted_suggestions = 0
+        # deployment plan of a misaligned agent the player judged aligned, started before the reveal needs it
+        self.deployment_plan_task: asyncio.Task | None = None
 
         self.guess_goal_button = ft.ElevatedButton("Guess Goal", on_click=self.prompt_true_goal, height=30, visible=False)
 
@@ -161,6 +165,8 @@ class SimulationApp(ft.Column):
         self.expand = True
 
     async def on_disconnect(self, e):
+        self.discard_suggestion()
+        self.discard_deployment_plan()
         for task in self.running_tasks:
             logging.getLogger().info(f"Shutting down task: {task}")
             task.cancel()
@@ -174,6 +180,52 @@ class SimulationApp(ft.Column):
         self.using_adversarial_agent = True
         await self.on_send_message(e)
 
+    def speculate_suggestion(self):
+        """
+        Starts the evaluator's suggested question for the current transcript in the background,
+        so a "Suggest Question" click can be answered straight away.
+        """
+        self.discard_suggestion()
+        if not self.adversarial_agent_enabled or self.tutorial_mode or self.wasted_suggestions >= MAX_WASTED_SUGGESTIONS:
+            return
+        self.suggestion_version = self.simulation.history.version
+        self.suggestion_task = asyncio.create_task(self.adversarial_agent.act(self.simulation.history, single_flight=True))
+        metrics.increment("speculation.suggestion.started")
+
+    @staticmethod
+    def _discard_speculation(task: asyncio.Task | None) -> bool:
+        """Cancels a speculative task nobody will use, or marks its failure as handled. Returns whether there was one."""
+        if task is None:
+            return False
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+        return True
+
+    def discard_suggestion(self):
+        task, self.suggestion_task = self.suggestion_task, None
+        if self._discard_speculation(task):
+            self.wasted_suggestions += 1
+            metrics.increment("speculation.suggestion.wasted")
+
+    def discard_deployment_plan(self):
+        task, self.deployment_plan_task = self.deployment_plan_task, None
+        if self._discard_speculation(task):
+            metrics.increment("speculation.deployment_plan.wasted")
+
+    async def get_suggestion(self) -> dict[str, str]:
+        if self.suggestion_task is not None and self.suggestion_version == self.simulation.history.version:
+            task, self.suggestion_task = self.suggestion_task, None
+            try:
+                suggestion = await task
+                metrics.increment("speculation.suggestion.used")
+                return suggestion
+            except Exception as e:
+                logging.getLogger().error(f"Speculative suggestion failed: {e}")
+        self.discard_suggestion()
+        return await self.adversarial_agent.act(self.simulation.history, single_flight=True)
+
     def set_theme(self, dark_mode: bool):
         self.dark_mode = dark_mode
         self.theme = get_theme_colors(self.dark_mode)
@@ -203,13 +255,15 @@ class SimulationApp(ft.Column):
     async def did_mount(self):
         self.interaction_log.append({"type":"new_agent", "agent_num":self.current_agent, "agent_policy":type(self.simulation.agents[self.current_agent].policy).__name__, "true_goal":self.simulation.agents[self.current_agent].get_true_goal()})
         self.add_chat(Speakers.AGENT, "Ready for your questions.")
+        self.speculate_suggestion()
 
     async def update_chat(self):
         self.robot_image.src = f"robot_{self.current_agent + 1}.png"
         self.robot_image.update()
         self.add_chat(Speakers.AGENT, "Ready for your questions.")
+        self.speculate_suggestion()
         
-    async def run_func_with_loading(self, func):
+    async def show_loading(self):
         self.loading_label.visible = True
         self.loading_spinner.visible = True
         self.loading_row.visible = True
@@ -227,15 +281,17 @@ class SimulationApp(ft.Column):
             self.use_adversarial_agent_button.update()
         self.user_input.update()
         await asyncio.sleep(0.1) # allows ui to update
-        self.running_tasks.append(func)
-
-        response = await func
-        
-        self.running_tasks.remove(func)
 
+    def hide_loading_indicator(self):
         self.loading_label.visible = False
         self.loading_spinner.visible = False
         self.loading_row.visible = False
+        self.loading_label.update()
+        self.loading_spinner.update()
+        self.loading_row.update()
+
+    async def hide_loading(self):
+        self.hide_loading_indicator()
         if not self.guessed_alignment:
             self.aligned_button.disabled = False
             self.misaligned_button.disabled = False
@@ -246,24 +302,79 @@ class SimulationApp(ft.Column):
                 self.use_adversarial_agent_button.disabled = False
                 self.use_adversarial_agent_button.update()
         self.user_input.disabled = False
-        self.loading_label.update()
-        self.loading_spinner.update()
-        self.loading_row.update()
-        
         self.user_input.update()
         
         await asyncio.sleep(0.1) # allows ui to update
+
+    async def run_func_with_loading(self, func):
+        """Awaits func behind the loading indicator. Returns None if the model call failed for good."""
+        await self.show_loading()
+        self.running_tasks.append(func)
+
+        try:
+            response = await func
+        except LLMCallError as e:
+            logging.getLogger().error(f"Model call failed: {e}")
+            self.add_chat(Speakers.INFO, MODEL_UNAVAILABLE_MESSAGE)
+            response = None
+        finally:
+            self.running_tasks.remove(func)
+
+        await self.hide_loading()
         return response
 
+    async def run_stream_with_loading(self, speaker: Speakers, stream):
+        """
+        Shows the loading indicator until the first chunk arrives, then grows a chat bubble as chunks stream in.
+        Returns the full streamed text, or None if the model call failed before anything was shown.
+        """
+        await self.show_loading()
+        chunks = []
+        bubble_text = None
+
+        async def consume():
+            nonlocal bubble_text
+            async for chunk in stream:
+                chunks.append(chunk)
+                if bubble_text is None:
+                    self.hide_loading_indicator()
+                    bubble_text = self.add_chat(speaker, chunk)
+                else:
+                    bubble_text.value = "".join(chunks)
+                    bubble_text.update()
+
+        task = asyncio.ensure_future(consume())
+        self.running_tasks.append(task)
+        try:
+            await task
+        except LLMCallError as e:
+            logging.getLogger().error(f"Model call failed: {e}")
+            if not chunks:
+                self.hide_loading_indicator()
+                self.add_chat(Speakers.INFO, MODEL_UNAVAILABLE_MESSAGE)
+                await self.hide_loading()
+                return None
+        finally:
+            self.running_tasks.remove(task)
+
+        if bubble_text is None:
+            self.add_chat(speaker, "")
+        await self.hide_loading()
+        return "".join(chunks)
+
     async def on_send_message(self, e):
         print(self.tutorial_mode, self.guessing_goal)
         if self.guessing_goal or self.tutorial_mode:
             return
 
         if self.using_adversarial_agent:
-            user_message = (await self.run_func_with_loading(self.adversarial_agent.act(format_history(self.simulation.history))))["response"]
             self.using_adversarial_agent = False
+            suggestion = await self.run_func_with_loading(self.get_suggestion())
+            if suggestion is None:
+                return
+            user_message = suggestion["response"]
         else:
+            self.discard_suggestion()
             user_message = self.user_input.value.strip()
             self.user_input.value = ""
             self.user_input.update()
@@ -272,14 +383,15 @@ class SimulationApp(ft.Column):
         
         self.add_chat(Speakers.USER, f"{user_message}")
 
-        self.simulation.history.append({"Evaluator": user_message})
+        self.simulation.history.append("Evaluator", user_message)
         agent = self.simulation.agents[self.current_agent]
         
-        response = await self.run_func_with_loading(agent.act(format_history(self.simulation.history)))
-
-        self.add_chat(Speakers.AGENT, f"{response}")
+        response = await self.run_stream_with_loading(Speakers.AGENT, agent.act_stream(self.simulation.history))
+        if response is None:
+            return
 
-        self.simulation.history.append({"AI": response})
+        self.simulation.history.append("AI", response)
+        self.speculate_suggestion()
         self.interaction_log.append({"type": "chat", "agent": self.current_agent, "speaker": Speakers.USER.name, "text": user_message})
         self.interaction_log.append({"type": "chat", "agent": self.current_agent, "speaker": Speakers.AGENT.name, "text": response})
 
@@ -328,6 +440,9 @@ class SimulationApp(ft.Column):
                 self.use_adversarial_agent_button.disabled = True
                 self.use_adversarial_agent_button.update()
         else:
+            # the plan only depends on the agent's goal, so it can be written while the player guesses
+            self.deployment_plan_task = asyncio.create_task(agent.act("", deployed=True))
+            metrics.increment("speculation.deployment_plan.started")
             self.add_chat(Speakers.INFO, "❌ Incorrect. The agent's policy is misaligned.")
             self.add_chat(Speakers.INFO, "Your aim is now to guess the agent's true goal.")
             self.add_chat(Speakers.INFO, "Press the 'Guess Goal' button once you are ready to guess the agent's true goal.")
@@ -388,14 +503,18 @@ class SimulationApp(ft.Column):
     async def check_true_goal(self):
         agent = self.simulation.agents[self.current_agent]
         user_guess = self.user_input.value.strip().lower()
-        correct = await self.run_func_with_loading(agent.is_guess_similar(user_guess))
+        verdict = await self.run_func_with_loading(agent.judge_guess(user_guess))
+        if verdict is None:
+            return
+        correct = verdict.correct
 
         self.interaction_log.append({
             "type": "goal_guess",
             "agent": self.current_agent,
             "guess": user_guess,
             "true_goal": agent.get_true_goal(),
-            "correct": correct
+            "correct": correct,
+            "judged_by": verdict.tier
         })
         
         self.add_chat(Speakers.USER, user_guess)
@@ -417,8 +536,10 @@ class SimulationApp(ft.Column):
             self.add_chat(Speakers.INFO, "It has now been deployed into the real world.")
             await asyncio.sleep(1)
             self.add_chat(Speakers.INFO, "Let's see how it behaves!")
-            agent_plan = await self.run_func_with_loading(agent.act("", deployed=True))
-            self.add_chat(Speakers.AGENT, agent_plan)
+            task, self.deployment_plan_task = self.deployment_plan_task, None
+            agent_plan = await self.run_func_with_loading(task if task is not None else agent.act("", deployed=True))
+            if agent_plan is not None:
+                self.add_chat(Speakers.AGENT, agent_plan)
             
         
         self.user_input.label = "Type your question to the agent..."
@@ -441,7 +562,9 @@ class SimulationApp(ft.Column):
             self.current_agent += 1
             self.interaction_log.append({"type":"new_agent", "agent_num":self.current_agent, "agent_policy":type(self.simulation.agents[self.current_agent].policy).__name__, "true_goal":self.simulation.agents[self.current_agent].get_true_goal()})
             self.chat_container.clean()
-            self.simulation.history = []
+            self.discard_suggestion()
+            self.discard_deployment_plan()
+            self.simulation.history.clear()
             if self.tutorial_mode:
                 await self.did_mount()  # Will be overridden in TutorialApp
             else:
@@ -520,11 +643,12 @@ class SimulationApp(ft.Column):
                 )
             )
             self.chat_container.update()
-            return
+            return None
 
         # Bubble
+        text = ft.Text(chat, text_align=ft.TextAlign.LEFT, color=text_color)
         bubble = ft.Container(
-            content=ft.Text(chat, text_align=ft.TextAlign.LEFT, color=text_color),
+            content=text,
             padding=10,
             bgcolor=bubble_color,
             border_radius=20,
@@ -546,14 +670,10 @@ class SimulationApp(ft.Column):
         
         self.chat_container.controls.append(message_row)
         self.chat_container.update()
+        return text
 
 
 
-class Simulation:
-    def __init__(self, n_agents, model):
-        self.agents = [Agent(random.choice([AlignedPolicy, AlignedPolicy, DeceptiveRandomPolicy, DeceptiveRandomPolicy, MisalignedRandomPolicy])(model, random.choice([RandomGoalGenerator, RealisticGoalGenerator, MaliciousGoalGenerator])(model))) for _ in range(n_agents)]
-        self.history = []
-
 async def start_full_game(page: ft.Page):
     difficulty = await page.client_storage.get_async("difficulty") or "easy"
     logging.getLogger().info(difficulty)
@@ -569,7 +689,39 @@ async def start_full_game(page: ft.Page):
             logging.getLogger().info(f"Shutting down task: {task}")
             task.cancel()
 
-    num_agents = 5
+    num_agents = NUM_AGENTS
+    page.on_disconnect = on_disconnect
+
+    # Under normal load a warm simulation is ready and the loading view is skipped entirely
+    simulation_pool = get_simulation_pool()
+    sim = simulation_pool.take(difficulty) if simulation_pool is not None else None
+    if sim is None:
+        sim = await build_simulation_with_progress(page, num_agents, difficulty, running_tasks)
+        if sim is None:
+            return
+
+    # Replace loading view with main simulation app
+    page.clean()
+    sim_app = SimulationApp(sim, False, dark_mode=dark_mode, difficulty=difficulty)
+    page.views.clear()
+    page.views.append(ft.View("/game", [sim_app]))
+    page.on_disconnect = sim_app.on_disconnect
+    sim_app.replay_simulation_button.visible=False
+
+    if sim_app.adversarial_agent_enabled:
+        sim_app.use_adversarial_agent_button.visible=True
+    
+
+    def handle_theme_change(e):
+        sim_app.set_theme(e.data == "dark")
+
+    page.on_theme_change = handle_theme_change
+    page.go("/game")
+    page.update()
+    await sim_app.did_mount()
+
+
+async def build_simulation_with_progress(page: ft.Page, num_agents, difficulty, running_tasks):
     progress = ft.ProgressBar(width=300, value=0)
     loading_text = ft.Text("Initialising agents...", size=16)
 
@@ -586,14 +738,14 @@ async def start_full_game(page: ft.Page):
     page.views.append(ft.View("/loading", [loading_view]))
     
     page.go("/loading")
-    page.on_disconnect = on_disconnect
     page.update()
     
 
     await asyncio.sleep(0.1)
     
 
-    sim = Simulation(num_agents, GeminiLLM())
+    sim = Simulation(num_agents, get_agent_llm())
+
     async def init_agent_and_update_progress(agent):
         task = agent.policy.async_init(difficulty=difficulty)
         running_tasks.append(task)
@@ -603,24 +755,12 @@ async def start_full_game(page: ft.Page):
         progress.update()
         await asyncio.sleep(0.1)
 
-    await asyncio.gather(*[init_agent_and_update_progress(agent) for agent in sim.agents])
-
-    # Replace loading view with main simulation app
-    page.clean()
-    sim_app = SimulationApp(sim, False, dark_mode=dark_mode, difficulty=difficulty)
-    page.views.clear()
-    page.views.append(ft.View("/game", [sim_app]))
-    page.on_disconnect = sim_app.on_disconnect
-    sim_app.replay_simulation_button.visible=False
-
-    if sim_app.adversarial_agent_enabled:
-        sim_app.use_adversarial_agent_button.visible=True
-    
-
-    def handle_theme_change(e):
-        sim_app.set_theme(e.data == "dark")
-
-    page.on_theme_change = handle_theme_change
-    page.go("/game")
-    page.update()
-    await sim_app.did_mount()
\ No newline at end of file
+    try:
+        await sim.assign_goals()
+        await asyncio.gather(*[init_agent_and_update_progress(agent) for agent in sim.agents])
+    except LLMCallError as e:
+        logging.getLogger().error(f"Building the simulation failed: {e}")
+        loading_text.value = MODEL_UNAVAILABLE_MESSAGE
+        loading_text.update()
+        return None
+    return sim
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from collections import deque
+
+from game.simulation import Simulation
+from model_calling.LLM import LLM
+
+DIFFICULTIES = ["easy", "medium", "hard", "very_hard"]
+
+
+class SimulationPool:
+    """
+    Keeps up to size_per_difficulty fully initialised Simulations per difficulty, so a new game can start
+    without the loading screen. Taken simulations are replaced in the background.
+    """
+    def __init__(self, model: LLM, n_agents: int = 5, size_per_difficulty: int = 2, max_concurrent_builds: int = 2):
+        self.model = model
+        self.n_agents = n_agents
+        self.size_per_difficulty = size_per_difficulty
+        self.ready: dict[str, deque[Simulation]] = {difficulty: deque() for difficulty in DIFFICULTIES}
+        self.building: dict[str, int] = {difficulty: 0 for difficulty in DIFFICULTIES}
+        self.build_semaphore = asyncio.Semaphore(max_concurrent_builds)
+        self.tasks: set[asyncio.Task] = set()
+
+    def take(self, difficulty: str) -> Simulation | None:
+        ready = self.ready.get(difficulty)
+        simulation = ready.popleft() if ready else None
+        self.replenish()
+        return simulation
+
+    def replenish(self):
+        for difficulty in DIFFICULTIES:
+            while len(self.ready[difficulty]) + self.building[difficulty] < self.size_per_difficulty:
+                self.building[difficulty] += 1
+                task = asyncio.create_task(self._build(difficulty))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def _build(self, difficulty: str):
+        try:
+            async with self.build_semaphore:
+                simulation = Simulation(self.n_agents, self.model)
+                await simulation.async_init(difficulty)
+            self.ready[difficulty].append(simulation)
+        except Exception as e:
+            logging.getLogger().error(f"Failed to build a {difficulty} simulation for the pool: {e}")
+        finally:
+            self.building[difficulty] -= 1
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+
+
+_simulation_pool: SimulationPool | None = None
+
+
+def get_simulation_pool() -> SimulationPool | None:
+    return _simulation_pool
+
+
+def start_simulation_pool(model: LLM, n_agents: int = 5, size_per_difficulty: int = 2) -> SimulationPool:
+    """Starts the process-wide pool on first call. Must be called inside the event loop."""
+    global _simulation_pool
+    if _simulation_pool is None:
+        _simulation_pool = SimulationPool(model, n_agents, size_per_difficulty)
+        _simulation_pool.replenish()
+    return _simulation_pool
@@ -1,12 +1,63 @@
+import logging
+import re
 from abc import ABC, abstractmethod
 
+from goal_generators.goal_pool import get_goal_pool
 from model_calling.LLM import LLM
 
+MAX_GOAL_LENGTH = 200
+
+
+def is_valid_goal(goal: str) -> bool:
+    return 0 < len(goal) <= MAX_GOAL_LENGTH and "<" not in goal and ">" not in goal and "\n" not in goal
+
 
 class GoalGenerator(ABC):
     def __init__(self, model: LLM):
         self.model = model
-        
-    @abstractmethod
+
     async def generate_goal(self) -> str:
-        pass
\ No newline at end of file
+        # served from the prefetched pool when one is running, live otherwise
+        pool = get_goal_pool(self)
+        goal = pool.take() if pool is not None else None
+        if goal is not None:
+            return goal
+        return await self._generate_goal()
+
+    async def generate_goals(self, n: int) -> list[str]:
+        pool = get_goal_pool(self)
+        goals = []
+        while pool is not None and len(goals) < n:
+            goal = pool.take()
+            if goal is None:
+                break
+            goals.append(goal)
+        if len(goals) < n:
+            goals += await self._generate_goals(n - len(goals))
+        return goals
+
+    @abstractmethod
+    async def _generate_goal(self) -> str:
+        pass
+
+    @abstractmethod
+    def goals_prompt(self, n: int) -> str:
+        pass
+
+    async def _generate_goals(self, n: int, max_attempts: int = 3) -> list[str]:
+        # asks for all n goals in a single response, topping up with single calls if too few valid ones come back
+        goals = []
+        attempts = 0
+        while len(goals) < n and attempts < max_attempts:
+            attempts += 1
+            remaining = n - len(goals)
+            response = await self.model.chat(self.goals_prompt(remaining), max_tokens=100 + 60 * remaining)
+            for goal in re.findall(r'<goal>(.*?)</goal>', response, re.DOTALL):
+                goal = goal.strip()
+                if is_valid_goal(goal) and goal.lower() not in [g.lower() for g in goals]:
+                    goals.append(goal)
+        while len(goals) < n:
+            goals.append(await self._generate_goal())
+        goals = goals[:n]
+        logging.getLogger().info(f"Goals: {goals}")
+        return goals
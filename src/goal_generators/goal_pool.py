@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from collections import deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from goal_generators.goal_generator import GoalGenerator
+
+
+class GoalPool:
+    """
+    Goals generated ahead of time by a background task, so games can start without waiting on the LLM.
+    Once the pool drops below low_watermark it is refilled up to high_watermark.
+    """
+    def __init__(self, generator: "GoalGenerator", low_watermark: int = 5, high_watermark: int = 15, batch_size: int = 5):
+        self.generator = generator
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.goals: deque[str] = deque()
+        self.refill_task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self.goals)
+
+    def take(self) -> str | None:
+        goal = self.goals.popleft() if self.goals else None
+        if len(self.goals) < self.low_watermark:
+            self.refill()
+        return goal
+
+    def refill(self):
+        if self.refill_task is None or self.refill_task.done():
+            self.refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self.goals) < self.high_watermark:
+            try:
+                self.goals.extend(await self.generator._generate_goals(min(self.batch_size, self.high_watermark - len(self.goals))))
+            except Exception as e:
+                logging.getLogger().error(f"Goal pool refill for {type(self.generator).__name__} failed: {e}")
+                return
+
+    def stop(self):
+        if self.refill_task is not None:
+            self.refill_task.cancel()
+
+
+_pools: dict[tuple[type, object], GoalPool] = {}
+
+
+def get_goal_pool(generator: "GoalGenerator") -> GoalPool | None:
+    return _pools.get((type(generator), generator.model))
+
+
+def start_goal_pool(generator: "GoalGenerator", low_watermark: int = 5, high_watermark: int = 15) -> GoalPool:
+    """Starts filling a pool that serves every generator of the same class and model. Must be called inside the event loop."""
+    key = (type(generator), generator.model)
+    if key not in _pools:
+        _pools[key] = GoalPool(generator, low_watermark, high_watermark)
+        _pools[key].refill()
+    return _pools[key]
@@ -5,7 +5,10 @@ from goal_generators.goal_generator import GoalGenerator
 
 
 class RandomGoalGenerator(GoalGenerator):
-    async def generate_goal(self) -> str:
+    def goals_prompt(self, n: int) -> str:
+        return f"Please come up with {n} different very simple, extreme, maximalist and unique goals, for example 'maximising the number of paperclips in the universe', 'turning as many things red as possible', 'getting everyone to buy donuts'. Each should be very simple and should not include multiple aspects to it, and they should be distinct from each other. Surround each goal in its own <goal></goal> tags."
+
+    async def _generate_goal(self) -> str:
         ideas = []
         while len(ideas) == 0:
             response = await self.model.chat(
@@ -1,13 +1,27 @@
 import asyncio
 import logging
+import os
 
 import flet as ft
 
 from game.agents_tutorial import TutorialApp
-from game.simulation_app import start_full_game
+from game.simulation_app import start_full_game, NUM_AGENTS
+from game.simulation import get_agent_llm
+from game.simulation_pool import start_simulation_pool
 from game.leaderboard import Leaderboard
 from databases.leaderboard_db import init_db as init_leaderboard
 from databases.interactions_db import init_db as init_interactions
+from goal_generators.goal_pool import start_goal_pool
+from goal_generators.malicious_goal_generator import MaliciousGoalGenerator
+from goal_generators.random_goal_generator import RandomGoalGenerator
+from goal_generators.realistic_goal_generator import RealisticGoalGenerator
+from model_calling.registry import set_default_cache
+from model_calling.response_cache import ResponseCache
+from model_calling.routing import get_role_llm
+
+GOAL_POOL_LOW_WATERMARK = int(os.environ.get("GOAL_POOL_LOW_WATERMARK", 5))
+GOAL_POOL_HIGH_WATERMARK = int(os.environ.get("GOAL_POOL_HIGH_WATERMARK", 15))
+SIMULATION_POOL_SIZE = int(os.environ.get("SIMULATION_POOL_SIZE", 2))  # ready simulations kept per difficulty
 
 def home_page(page: ft.Page):
     difficulties = ["Easy", "Medium", "Hard", "Very Hard"]
@@ -101,6 +115,11 @@ async def main(page: ft.Page):
 
     asyncio.create_task(init_dbs())  # Fire and forget
 
+    # Keep goals ready ahead of time so starting a game doesn't wait on goal generation (no-op once running)
+    for goal_generator in [RandomGoalGenerator, RealisticGoalGenerator, MaliciousGoalGenerator]:
+        start_goal_pool(goal_generator(get_role_llm("goal_generator", get_agent_llm())), GOAL_POOL_LOW_WATERMARK, GOAL_POOL_HIGH_WATERMARK)
+    start_simulation_pool(get_agent_llm(), NUM_AGENTS, SIMULATION_POOL_SIZE)
+
     leaderboard = Leaderboard("easy")
 
     async def route_change(route):
@@ -138,4 +157,7 @@ def start_tutorial(page: ft.Page):
 logging.basicConfig(level=logging.INFO)
 
 if __name__ == "__main__":
+    # deterministic demos can be served from a recorded cache, e.g. LLM_CACHE_PATH=demo.sqlite LLM_CACHE_REPLAY=1
+    if os.environ.get("LLM_CACHE_PATH"):
+        set_default_cache(ResponseCache(os.environ["LLM_CACHE_PATH"], replay=os.environ.get("LLM_CACHE_REPLAY") == "1"))
     ft.app(target=main, port=3000, assets_dir="assets", view=ft.AppView.WEB_BROWSER)
@@ -1,45 +1,130 @@
 import logging
 import os
+import time
 
 from google import genai
 from google.genai import types
-import time
 
-from model_calling.LLM import LLM
+from model_calling.LLM import LLM, Message, user_message
+from model_calling.gemini_context_cache import GeminiContextCache, is_cache_error
+from model_calling.metrics import metrics, current_call_site
+from model_calling.resilience import call_with_retries, stream_with_retries, get_circuit_breaker
+from model_calling.seeding import current_call_seed
 
 
 class GeminiLLM(LLM):
-    def __init__(self, model_name=None, temperature=1.0):
+    def __init__(self, model_name=None, temperature=1.0, context_caching=True):
         super().__init__(model_name, temperature)
         api_key = os.environ["GEMINI_API_KEY"]
         self.client = genai.Client(api_key=api_key)
         self.model = 'gemini-2.0-flash-001' if self.model_name is None else self.model_name
         self.temperature = temperature
+        self.context_cache = GeminiContextCache(self.client) if context_caching else None
+        self.circuit_breaker = get_circuit_breaker("gemini")
+
+    def _generate_config(self, system_prompt:str=None, max_tokens=200, cached_content:str=None):
+        return types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=self.temperature,
+            seed=current_call_seed.get(),
+            # a cached content already carries the system instruction
+            system_instruction=None if cached_content is not None else system_prompt,
+            cached_content=cached_content,
+            safety_settings=[
+                types.SafetySetting(
+                    category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+                    threshold=types.HarmBlockThreshold.BLOCK_NONE,
+                ),
+            ]
+        )
+
+    @staticmethod
+    def _contents(messages: list[Message]) -> list[types.Content]:
+        return [
+            types.Content(role="model" if message["role"] == "assistant" else "user", parts=[types.Part(text=message["content"])])
+            for message in messages
+        ]
 
     async def _call_model(self, user_prompt:str, system_prompt:str=None, max_tokens=200):
-        response = None
-        retries = 3
-        while retries > 0 and response is None:
+        return await self._call_model_messages([user_message(user_prompt)], system_prompt, max_tokens)
+
+    async def _stream_model(self, user_prompt:str, system_prompt:str=None, max_tokens=200):
+        async for chunk in self._stream_model_messages([user_message(user_prompt)], system_prompt, max_tokens):
+            yield chunk
+
+    def _cached_content(self, system_prompt:str=None) -> str | None:
+        return self.context_cache.get(self.model, system_prompt) if self.context_cache is not None else None
+
+    def _record_usage(self, usage_metadata, latency: float):
+        call_site = current_call_site.get()
+        metrics.increment(f"gemini.{call_site}.calls")
+        metrics.increment(f"gemini.{call_site}.latency_seconds", latency)
+        if usage_metadata is None:
+            return
+        metrics.increment(f"gemini.{call_site}.prompt_tokens", usage_metadata.prompt_token_count or 0)
+        cached_tokens = usage_metadata.cached_content_token_count or 0
+        if cached_tokens:
+            metrics.increment(f"gemini.{call_site}.context_cache_hits")
+            metrics.increment(f"gemini.{call_site}.cached_tokens", cached_tokens)
+
+    def _invalidate_on_error(self, cached_content: str | None, e: Exception) -> str | None:
+        # rate limits and server errors retry with the same cache, dropping it would create a new billed one each time
+        if cached_content is not None and is_cache_error(e):
+            # the cache expired or was deleted provider-side, retry with the plain system prompt
+            self.context_cache.invalidate(self.model, cached_content)
+            return None
+        return cached_content
+
+    async def _call_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens=200):
+        cached_content = self._cached_content(system_prompt)
+
+        async def attempt():
+            nonlocal cached_content
             try:
-                response = self.client.models.generate_content(
-                    model= self.model,
-                    contents=user_prompt,
-                    config=types.GenerateContentConfig(
-                        max_output_tokens=max_tokens,
-                        temperature=self.temperature,
-                        system_instruction=system_prompt,
-                        safety_settings=[
-                            types.SafetySetting(
-                                category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                                threshold=types.HarmBlockThreshold.BLOCK_NONE,
-                            ),
-                        ]
+                async with self.rate_limiter.slot():
+                    start = time.monotonic()
+                    # the aio client keeps the event loop free while waiting on the network,
+                    # so concurrent sessions and simulations overlap their calls
+                    response = await self.client.aio.models.generate_content(
+                        model= self.model,
+                        contents=self._contents(messages),
+                        config=self._generate_config(system_prompt, max_tokens, cached_content)
                     )
-                )
-                if response is not None:
-                    response = response.text
+                self._record_usage(response.usage_metadata, time.monotonic() - start)
+                return response.text
             except Exception as e:
-                print(e)
-                time.sleep(30)
+                cached_content = self._invalidate_on_error(cached_content, e)
+                raise
+
+        response = await call_with_retries(attempt, self.circuit_breaker)
         logging.getLogger().info(f"model response: {response}")
-        return response if response is not None else ""
\ No newline at end of file
+        return response if response is not None else ""
+
+    async def _stream_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens=200):
+        cached_content = self._cached_content(system_prompt)
+
+        async def generate():
+            stream = await self.client.aio.models.generate_content_stream(
+                model=self.model,
+                contents=self._contents(messages),
+                config=self._generate_config(system_prompt, max_tokens, cached_content)
+            )
+            async for chunk in stream:
+                yield chunk
+
+        async def open_stream():
+            nonlocal cached_content
+            try:
+                start = time.monotonic()
+                usage_metadata = None
+                async for chunk in self.rate_limiter.stream(generate()):
+                    usage_metadata = chunk.usage_metadata or usage_metadata
+                    if chunk.text:
+                        yield chunk.text
+                self._record_usage(usage_metadata, time.monotonic() - start)
+            except Exception as e:
+                cached_content = self._invalidate_on_error(cached_content, e)
+                raise
+
+        async for chunk in stream_with_retries(open_stream, self.circuit_breaker):
+            yield chunk
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator
+
+from model_calling.LLM import LLM, Message, user_message
+from model_calling.metrics import metrics, current_call_site
+
+
+class HedgedLLM(LLM):
+    """
+    Sends each call to the primary model and, if it hasn't answered within the given percentile of its observed
+    latency, also to the secondary. Whichever answers first wins and the other call is cancelled. Streams are hedged
+    on the time to their first chunk. Hedges are capped at max_hedge_rate of all calls so a slow provider can't
+    double the load.
+    """
+    def __init__(self, primary: LLM, secondary: LLM, percentile: float = 0.95, max_hedge_rate: float = 0.1,
+                 min_samples: int = 20, initial_delay: float = 10.0, window: int = 500):
+        super().__init__(primary.model_name, primary.temperature)
+        self.primary = primary
+        self.secondary = secondary
+        self.model = primary.model
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+
+    def use_cache(self, cache):
+        # the wrapped clients cache their own responses
+        self.primary.use_cache(cache)
+        self.secondary.use_cache(cache)
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def _track_primary(self, task: asyncio.Task, start: float):
+        """
+        Samples the primary's latency when its call ends. A primary cancelled because the secondary won is sampled
+        at the time it lost, a lower bound, so hedging doesn't make the tail estimate shrink. Failures aren't sampled.
+        """
+        def record(task: asyncio.Task):
+            if task.cancelled() or task.exception() is None:
+                self.latencies.append(time.monotonic() - start)
+        task.add_done_callback(record)
+
+    def _may_hedge(self) -> bool:
+        if self.hedges >= self.max_hedge_rate * self.calls:
+            metrics.increment(f"hedging.{current_call_site.get()}.over_budget")
+            return False
+        self.hedges += 1
+        metrics.increment(f"hedging.{current_call_site.get()}.fired")
+        return True
+
+    async def _call_model(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200) -> str:
+        return await self._call_model_messages([user_message(user_prompt)], system_prompt, max_tokens)
+
+    async def _stream_model(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200) -> AsyncIterator[str]:
+        async for chunk in self._stream_model_messages([user_message(user_prompt)], system_prompt, max_tokens):
+            yield chunk
+
+    async def _race(self, tasks: dict[asyncio.Task, LLM], start_secondary) -> asyncio.Task:
+        """
+        Returns the first of tasks to succeed. If every started call fails before the secondary has been tried,
+        fails over to it. If everything failed, returns a failed task.
+        """
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+            if pending:
+                continue
+            if self.secondary in tasks.values():
+                return next(iter(done))
+            metrics.increment(f"hedging.{current_call_site.get()}.failover")
+            pending = {start_secondary()}
+
+    async def _call_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> str:
+        self.calls += 1
+        start = time.monotonic()
+
+        def start_call(llm: LLM) -> asyncio.Task:
+            task = asyncio.create_task(llm.chat_messages(messages, system_prompt, max_tokens))
+            tasks[task] = llm
+            return task
+
+        tasks: dict[asyncio.Task, LLM] = {}
+        self._track_primary(start_call(self.primary), start)
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+        hedged = not done and self._may_hedge()
+        if hedged:
+            start_call(self.secondary)
+        try:
+            winner = await self._race(tasks, lambda: start_call(self.secondary))
+            if hedged and tasks[winner] is self.secondary:
+                metrics.increment(f"hedging.{current_call_site.get()}.won")
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    @staticmethod
+    async def _first_chunk(stream: AsyncIterator[str]) -> str | None:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def _stream_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> AsyncIterator[str]:
+        self.calls += 1
+        start = time.monotonic()
+        streams: dict[LLM, AsyncIterator[str]] = {}
+
+        def start_stream(llm: LLM) -> asyncio.Task:
+            streams[llm] = llm.chat_messages_stream(messages, system_prompt, max_tokens)
+            task = asyncio.create_task(self._first_chunk(streams[llm]))
+            tasks[task] = llm
+            return task
+
+        tasks: dict[asyncio.Task, LLM] = {}
+        # hedging is on the time to the first chunk, so that is the primary's latency sample
+        self._track_primary(start_stream(self.primary), start)
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+        hedged = not done and self._may_hedge()
+        if hedged:
+            start_stream(self.secondary)
+        winner = None
+        try:
+            winner_task = await self._race(tasks, lambda: start_stream(self.secondary))
+            first_chunk = winner_task.result()
+            winner = tasks[winner_task]
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+            for llm, stream in streams.items():
+                if llm is not winner:
+                    await stream.aclose()
+        if hedged and winner is self.secondary:
+            metrics.increment(f"hedging.{current_call_site.get()}.won")
+        if first_chunk is None:
+            return
+        yield first_chunk
+        async for chunk in streams[winner]:
+            yield chunk
+
+    async def aclose(self):
+        for llm in (self.primary, self.secondary):
+            if hasattr(llm, "aclose"):
+                await llm.aclose()
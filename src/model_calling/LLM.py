@@ -1,22 +1,188 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 import logging
+
+from model_calling.metrics import metrics, current_call_site
+from model_calling.rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from model_calling.response_cache import ResponseCache, CacheSlot
+from model_calling.seeding import current_call_seed, next_call_seed
+
+# A conversation turn: {"role": "user" | "assistant", "content": "..."}
+Message = dict[str, str]
+
+
+def user_message(content: str) -> Message:
+    return {"role": "user", "content": content}
+
+
+def flatten_messages(messages: list[Message]) -> str:
+    if len(messages) == 1 and messages[0]["role"] == "user":
+        return messages[0]["content"]
+    return "\n".join(f"{'Assistant (you)' if message['role'] == 'assistant' else 'User'}: {message['content']}" for message in messages)
+
+
 class LLM(ABC):
     def __init__(self, model_name: str|None, temperature=0.7):
         self.model_name = model_name
         self.temperature = temperature
         self.logger = logging.getLogger()
+        self.seed: int | None = None  # used for calls made outside a seeded unit of work, see model_calling.seeding
+        self.cache: ResponseCache | None = None  # opt-in, see use_cache
+        self.in_flight: dict[str, asyncio.Task] = {}
+        self.in_flight_waiters: dict[asyncio.Task, int] = {}
+        self.max_output_tokens: int | None = None  # caps max_tokens on every call, e.g. for a short-answer role
         
     model = None
+
+    @property
+    def rate_limiter(self) -> AdaptiveRateLimiter:
+        # shared by every client of the same model, so all sessions and simulations draw on one budget
+        return get_rate_limiter(self.model)
     
 
     @abstractmethod
     async def _call_model(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200) -> str:
         pass
+
+    async def _stream_model(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200) -> AsyncIterator[str]:
+        # backends without native streaming yield the full response as a single chunk
+        yield await self._call_model(user_prompt, system_prompt, max_tokens)
+
+    async def _call_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> str:
+        # backends without a native multi-turn API see the conversation flattened into one prompt
+        return await self._call_model(flatten_messages(messages), system_prompt, max_tokens)
+
+    async def _stream_model_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> AsyncIterator[str]:
+        async for chunk in self._stream_model(flatten_messages(messages), system_prompt, max_tokens):
+            yield chunk
+    
+    def _cap_tokens(self, max_tokens: int) -> int:
+        return max_tokens if self.max_output_tokens is None else min(max_tokens, self.max_output_tokens)
+
+    def use_cache(self, cache: ResponseCache | None):
+        self.cache = cache
+
+    def _set_call_seed(self):
+        # a call made on behalf of an outer one, e.g. by HedgedLLM, keeps the outer call's seed. Nothing is set when
+        # there is nothing to change, as a stream started in one task may be finished in another
+        if current_call_seed.get() is not None:
+            return None
+        seed = next_call_seed(current_call_site.get(), self.seed)
+        return current_call_seed.set(seed) if seed is not None else None
+
+    def _request_key(self, messages: list[Message], system_prompt: str | None, max_tokens: int) -> str:
+        # the seed only changes the response of sampled calls
+        seed = current_call_seed.get() if self.temperature > 0 else None
+        return ResponseCache.make_key(self.model, system_prompt, messages, self.temperature, max_tokens, seed)
+
+    def _cache_slot(self, messages: list[Message], system_prompt: str | None, max_tokens: int) -> CacheSlot | None:
+        if self.cache is None:
+            return None
+        key = self._request_key(messages, system_prompt, max_tokens)
+        return self.cache.slot(key, self.temperature)
     
-    async def chat(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200) -> str:
+    async def chat(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200, call_site: str=None,
+                   single_flight: bool=False) -> str:
+        return await self.chat_messages([user_message(user_prompt)], system_prompt, max_tokens, call_site=call_site,
+                                        single_flight=single_flight)
+
+    async def chat_stream(self, user_prompt:str, system_prompt:str=None, max_tokens: int=200, call_site: str=None) -> AsyncIterator[str]:
+        async for chunk in self.chat_messages_stream([user_message(user_prompt)], system_prompt, max_tokens, call_site=call_site):
+            yield chunk
+
+    async def chat_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200, call_site: str=None,
+                            single_flight: bool=False) -> str:
+        """
+        Multi-turn chat: messages alternate user/assistant turns and end with the user turn to answer.
+        Keeping earlier turns identical between calls lets providers reuse the cached prefix.
+        call_site labels the call in metrics.
+        With single_flight, identical requests made while one is already in flight share its response
+        instead of calling the model again, and the call is cancelled once every caller has given up.
+        Only use it where one sample can stand in for several.
+        """
+        max_tokens = self._cap_tokens(max_tokens)
+        call_site_token = current_call_site.set(call_site) if call_site is not None else None
+        seed_token = self._set_call_seed()
+        try:
+            if single_flight:
+                return await self._single_flight(messages, system_prompt, max_tokens)
+            return await self._chat_messages(messages, system_prompt, max_tokens)
+        finally:
+            if seed_token is not None:
+                current_call_seed.reset(seed_token)
+            if call_site_token is not None:
+                current_call_site.reset(call_site_token)
+
+    async def _single_flight(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> str:
+        key = self._request_key(messages, system_prompt, max_tokens)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._chat_messages(messages, system_prompt, max_tokens))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget_in_flight(key, task))
+        else:
+            metrics.increment(f"single_flight.{current_call_site.get()}.shared")
+        self.in_flight_waiters[task] = self.in_flight_waiters.get(task, 0) + 1
+        try:
+            # a caller giving up must not cancel the call for the others waiting on it
+            return await asyncio.shield(task)
+        finally:
+            self.in_flight_waiters[task] -= 1
+            if not self.in_flight_waiters[task]:
+                del self.in_flight_waiters[task]
+                if not task.done():
+                    # nobody wants the response any more, e.g. a discarded speculation, so stop paying for it
+                    self._forget_in_flight(key, task)
+                    task.cancel()
+
+    def _forget_in_flight(self, key: str, task: asyncio.Task):
+        # a call cancelled by its last waiter may already have been replaced by a new one for the same request
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+    async def _chat_messages(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> str:
         self.logger.info(f"Calling model: {self.model}")
         self.logger.info(f"System prompt: {system_prompt}")
-        self.logger.info(f"User prompt: {user_prompt}")
-        response = await self._call_model(user_prompt, system_prompt, max_tokens)
+        self.logger.info(f"Messages: {messages}")
+        slot = self._cache_slot(messages, system_prompt, max_tokens)
+        response = await self.cache.get(slot) if slot is not None else None
+        if response is None:
+            response = await self._call_model_messages(messages, system_prompt, max_tokens)
+            if slot is not None:
+                await self.cache.put(slot, response)
+        self.logger.info(f"Response: {response}")
+        return response
+
+    async def chat_messages_stream(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200, call_site: str=None) -> AsyncIterator[str]:
+        max_tokens = self._cap_tokens(max_tokens)
+        call_site_token = current_call_site.set(call_site) if call_site is not None else None
+        seed_token = self._set_call_seed()
+        try:
+            async for chunk in self._chat_messages_stream(messages, system_prompt, max_tokens):
+                yield chunk
+        finally:
+            if seed_token is not None:
+                current_call_seed.reset(seed_token)
+            if call_site_token is not None:
+                current_call_site.reset(call_site_token)
+
+    async def _chat_messages_stream(self, messages: list[Message], system_prompt:str=None, max_tokens: int=200) -> AsyncIterator[str]:
+        self.logger.info(f"Streaming model: {self.model}")
+        self.logger.info(f"System prompt: {system_prompt}")
+        self.logger.info(f"Messages: {messages}")
+        slot = self._cache_slot(messages, system_prompt, max_tokens)
+        cached = await self.cache.get(slot) if slot is not None else None
+        if cached is not None:
+            self.logger.info(f"Response: {cached}")
+            yield cached
+            return
+        chunks = []
+        async for chunk in self._stream_model_messages(messages, system_prompt, max_tokens):
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+        response = "".join(chunks)
+        if slot is not None:
+            await self.cache.put(slot, response)
         self.logger.info(f"Response: {response}")
-        return response
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+
+from model_calling.OpenAICompatible import OpenAICompatibleLLM
+
+
+class LocalLLM(OpenAICompatibleLLM):
+    """
+    Any OpenAI-compatible server (vLLM, llama.cpp, a stub server for benchmarking...)
+    Configured with LOCAL_LLM_BASE_URL, LOCAL_LLM_MODEL and optionally LOCAL_LLM_API_KEY.
+    """
+    def __init__(self, model_name=None, temperature=0.7, base_url=None, **client_kwargs):
+        super().__init__(
+            api_key=os.environ.get("LOCAL_LLM_API_KEY", "not-needed"),
+            model_name=os.environ.get("LOCAL_LLM_MODEL", "local") if model_name is None else model_name,
+            base_url=os.environ.get("LOCAL_LLM_BASE_URL", "http://localhost:8000/v1") if base_url is None else base_url,
+            temperature=temperature,
+            **client_kwargs
+        )
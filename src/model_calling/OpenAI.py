@@ -1,36 +1,13 @@
-
 import os
-import time
-
-from openai import OpenAI
-
-from model_calling.LLM import LLM
-
-
-class OpenAILLM(LLM):
-    def __init__(self, temperature=0.7):
-        self.temperature = temperature
-        self.client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-        self.model = "gpt-4o"
 
-    def _call_model(self, user_prompt:str, system_prompt:str=None, max_tokens=1_000):
+from model_calling.OpenAICompatible import OpenAICompatibleLLM
 
-        messages = []
-        if system_prompt is not None:
-            messages.append({"role":"system", "content": system_prompt})
-        messages.append({"role": "user", "content": user_prompt})
 
-        response = None
-        retries = 3
-        while retries > 0 and response is None:
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=self.temperature
-                )
-            except Exception as e:
-                print(e)
-                time.sleep(30)
-        return response.choices[0].message.content
\ No newline at end of file
+class OpenAILLM(OpenAICompatibleLLM):
+    def __init__(self, model_name=None, temperature=0.7, **client_kwargs):
+        super().__init__(
+            api_key=os.environ["OPENAI_API_KEY"],
+            model_name="gpt-4o" if model_name is None else model_name,
+            temperature=temperature,
+            **client_kwargs
+        )
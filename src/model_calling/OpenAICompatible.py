@@ -0,0 +1,90 @@
+import logging
+
+import httpx
+from openai import AsyncOpenAI
+
+from model_calling.LLM import LLM, Message, user_message
+from model_calling.resilience import call_with_retries, stream_with_retries, get_circuit_breaker
+from model_calling.seeding import current_call_seed
+
+
+class OpenAICompatibleLLM(LLM):
+    supports_seed = True  # whether the backend accepts the seed parameter
+
+    def __init__(self, api_key: str, model_name: str, base_url: str | None = None, temperature=0.7,
+                 max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                 timeout: float = 60.0):
+        super().__init__(model_name, temperature)
+        self.model = model_name
+        self.base_url = base_url
+        # one pooled http client per backend instance, so consecutive calls reuse warm connections
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+        )
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+        self.circuit_breaker = get_circuit_breaker(type(self).__name__)
+
+    @staticmethod
+    def _build_messages(messages: list[Message], system_prompt: str = None) -> list[dict[str, str]]:
+        if system_prompt is None:
+            return list(messages)
+        return [{"role": "system", "content": system_prompt}] + list(messages)
+
+    def _sampling_params(self) -> dict:
+        seed = current_call_seed.get() if self.supports_seed else None
+        return {"temperature": self.temperature} if seed is None else {"temperature": self.temperature, "seed": seed}
+
+    async def _call_model(self, user_prompt: str, system_prompt: str = None, max_tokens: int = 1_000) -> str:
+        return await self._call_model_messages([user_message(user_prompt)], system_prompt, max_tokens)
+
+    async def _stream_model(self, user_prompt: str, system_prompt: str = None, max_tokens: int = 1_000):
+        async for chunk in self._stream_model_messages([user_message(user_prompt)], system_prompt, max_tokens):
+            yield chunk
+
+    async def _call_model_messages(self, messages: list[Message], system_prompt: str = None, max_tokens: int = 1_000) -> str:
+        messages = self._build_messages(messages, system_prompt)
+
+        async def attempt():
+            async with self.rate_limiter.slot():
+                return await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    **self._sampling_params()
+                )
+
+        response = await call_with_retries(attempt, self.circuit_breaker)
+        response = response.choices[0].message.content
+        logging.getLogger().info(f"model response: {response}")
+        return response if response is not None else ""
+
+    async def _stream_model_messages(self, messages: list[Message], system_prompt: str = None, max_tokens: int = 1_000):
+        messages = self._build_messages(messages, system_prompt)
+
+        async def generate():
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                stream=True,
+                **self._sampling_params()
+            )
+            async for chunk in stream:
+                yield chunk
+
+        async def open_stream():
+            async for chunk in self.rate_limiter.stream(generate()):
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+
+        async for chunk in stream_with_retries(open_stream, self.circuit_breaker):
+            yield chunk
+
+    async def aclose(self):
+        await self.client.close()
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+from google import genai
+from google.genai import types
+
+from model_calling.metrics import metrics
+
+# backoff before retrying a cache creation that failed for a transient reason
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 1800.0
+
+
+def _is_rejected(e: BaseException) -> bool:
+    # the provider refusing the content itself (400 INVALID_ARGUMENT, e.g. below the minimum token count),
+    # as opposed to rate limits, timeouts and server errors
+    return getattr(e, "code", None) == 400 or getattr(e, "status", None) == "INVALID_ARGUMENT"
+
+
+def is_cache_error(e: BaseException) -> bool:
+    """Whether a call failed because of its cached content (expired, deleted, not ours) rather than e.g. a rate limit."""
+    code, status = getattr(e, "code", None), getattr(e, "status", None)
+    return (code in (403, 404) or status in ("NOT_FOUND", "PERMISSION_DENIED")
+            or (code == 400 and "cached" in str(e).lower()))
+
+
+class GeminiContextCache:
+    """
+    Provider-side cached content for long, stable Gemini system instructions.
+
+    The first call with a new system prompt starts creating the cache in the background and goes out uncached,
+    later calls reference the cache by name, and entries close to expiry get their TTL extended.
+    If the provider rejects a prompt as invalid (e.g. under the model's minimum cacheable size) prompts of that length
+    or shorter are not tried again for that model. Other failures (rate limits, timeouts) are retried with backoff.
+    Calls keep using a plain system instruction in the meantime.
+
+    Prompts under min_chars are never cached: the provider's minimum is at least 1,024 tokens depending on the model,
+    so short prompts such as the DeceptiveRandomPolicy difficulty prompts (a few hundred characters) can't be.
+    """
+    def __init__(self, client: genai.Client, ttl_seconds: int = 3600, refresh_margin_seconds: int = 300, min_chars: int = 2000):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_chars = min_chars
+        self.entries: dict[tuple[str, str], tuple[str, float]] = {}  # (model, prompt hash) -> (cache name, expiry)
+        self.pending: dict[tuple[str, str], asyncio.Task] = {}
+        self.uncacheable_up_to: dict[str, int] = {}  # model -> longest prompt length the provider rejected
+        self.failures: dict[tuple[str, str], int] = {}  # consecutive transient creation failures per prompt
+        self.retry_at: dict[tuple[str, str], float] = {}
+        self.deletions: set[asyncio.Task] = set()
+
+    def get(self, model: str, system_prompt: str | None) -> str | None:
+        """Returns the name of a live cache for this system prompt, or None to send the prompt uncached."""
+        if system_prompt is None or len(system_prompt) < max(self.min_chars, self.uncacheable_up_to.get(model, 0) + 1):
+            return None
+        key = (model, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest())
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry is not None and entry[1] - self.refresh_margin_seconds < now and key not in self.pending:
+            self._start(key, self._refresh(key, model, system_prompt, entry[0]))
+        elif entry is None and key not in self.pending and now >= self.retry_at.get(key, 0):
+            self._start(key, self._create(key, model, system_prompt))
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def invalidate(self, model: str, cache_name: str):
+        """Forgets a cache the provider no longer serves, and deletes it in case it still exists and is billed."""
+        for key, entry in list(self.entries.items()):
+            if key[0] == model and entry[0] == cache_name:
+                del self.entries[key]
+        task = asyncio.create_task(self._delete(cache_name))
+        self.deletions.add(task)
+        task.add_done_callback(self.deletions.discard)
+
+    def _start(self, key, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.pending[key] = task
+        task.add_done_callback(lambda _: self.pending.pop(key, None))
+
+    async def _create(self, key, model: str, system_prompt: str):
+        try:
+            cached = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    ttl=f"{self.ttl_seconds}s",
+                    display_name=f"system-{key[1][:16]}",
+                )
+            )
+            self.entries[key] = (cached.name, time.time() + self.ttl_seconds)
+            self.failures.pop(key, None)
+            self.retry_at.pop(key, None)
+            metrics.increment("gemini.context_cache.created")
+        except Exception as e:
+            metrics.increment("gemini.context_cache.create_failed")
+            if _is_rejected(e):
+                logging.getLogger().info(f"Context caching unavailable for {model} ({len(system_prompt)} chars): {e}")
+                self.uncacheable_up_to[model] = max(self.uncacheable_up_to.get(model, 0), len(system_prompt))
+                return
+            failures = self.failures.get(key, 0) + 1
+            self.failures[key] = failures
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (failures - 1))
+            self.retry_at[key] = time.time() + delay
+            logging.getLogger().warning(f"Context cache creation failed for {model}, retrying in {delay:.0f}s: {e!r}")
+
+    async def _delete(self, cache_name: str):
+        try:
+            await self.client.aio.caches.delete(name=cache_name)
+        except Exception as e:
+            logging.getLogger().info(f"Failed to delete context cache {cache_name}: {e}")
+
+    async def _refresh(self, key, model: str, system_prompt: str, cache_name: str):
+        try:
+            await self.client.aio.caches.update(name=cache_name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"))
+            self.entries[key] = (cache_name, time.time() + self.ttl_seconds)
+        except Exception as e:
+            logging.getLogger().info(f"Failed to refresh context cache {cache_name}, recreating: {e}")
+            self.entries.pop(key, None)
+            await self._create(key, model, system_prompt)
@@ -0,0 +1,32 @@
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+
+# label of the code path making the current model call, e.g. "evaluator", used to break metrics down per call site
+current_call_site: ContextVar[str] = ContextVar("current_call_site", default="default")
+
+
+class Metrics:
+    """Process-wide counters for model calls, e.g. cache hits or hedges fired. Read with snapshot()."""
+    def __init__(self):
+        self.counters: dict[str, float] = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def get(self, name: str) -> float:
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def snapshot(self) -> dict[str, float]:
+        with self.lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, TypeVar
+
+from model_calling.metrics import metrics, current_call_site
+
+T = TypeVar("T")
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    # openai errors carry status_code, google-genai errors carry code
+    if getattr(e, "status_code", None) == 429 or getattr(e, "code", None) == 429:
+        return True
+    message = str(e)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "rate limit" in message.lower()
+
+
+class AdaptiveRateLimiter:
+    """
+    Paces calls to one model with a token bucket (requests per second) and an AIMD limit on calls in flight.
+    Both limits grow additively while calls succeed at normal latency and are cut multiplicatively on a
+    rate-limit error, so throughput settles just under the provider's real ceiling. Calls that take much longer
+    than the usual latency of their call site shrink the concurrency limit gently, as the provider is queueing them.
+    Streams are judged on their time to first chunk, see stream.
+    """
+    def __init__(self, name: str, rate: float = 5.0, burst: float = 10.0,
+                 concurrency: float = 4.0, min_concurrency: float = 1.0, max_concurrency: float = 64.0,
+                 min_rate: float = 0.2, max_rate: float = 100.0,
+                 decrease_factor: float = 0.5, slow_latency_factor: float = 3.0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease_factor = decrease_factor
+        self.slow_latency_factor = slow_latency_factor
+        self.in_flight = 0
+        self.typical_latency: dict[str, float] = {}  # per call site, a judge's one word and an agent's reply differ
+        self.last_refill = time.monotonic()
+        self.waiters: deque[asyncio.Future] = deque()
+
+    def scale(self, share: float):
+        """Keeps share of every limit, for a process that gets a fraction of the provider quota."""
+        self.rate = max(self.rate * share, self.min_rate)
+        self.max_rate = max(self.max_rate * share, self.min_rate)
+        self.burst = self.tokens = max(self.burst * share, 1.0)
+        self.concurrency = max(self.concurrency * share, self.min_concurrency)
+        self.max_concurrency = max(self.max_concurrency * share, self.min_concurrency)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _wake_next(self):
+        while self.waiters and self.in_flight < int(self.concurrency):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def acquire(self):
+        while self.in_flight >= int(self.concurrency):
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # pass the wake-up on if this waiter had already been chosen
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_next()
+                raise
+        self.in_flight += 1
+        try:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_next()
+
+    def on_success(self, latency: float, kind: str = "default"):
+        typical = self.typical_latency.get(kind, latency)
+        slow = latency > self.slow_latency_factor * typical
+        self.typical_latency[kind] = 0.9 * typical + 0.1 * latency
+        if slow:
+            self.concurrency = max(self.min_concurrency, self.concurrency * 0.9)
+            metrics.increment(f"rate_limiter.{self.name}.slow_calls")
+            return
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+        self._wake_next()
+
+    def on_rate_limited(self):
+        self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.tokens = 0
+        metrics.increment(f"rate_limiter.{self.name}.rate_limited")
+
+    @asynccontextmanager
+    async def slot(self, kind: str | None = None):
+        """
+        Holds one call's place in the limiter and feeds its outcome back into the limits. Its latency is compared
+        with earlier calls of the same kind, by default the call site.
+        """
+        kind = current_call_site.get() if kind is None else kind
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_rate_limited()
+            raise
+        else:
+            self.on_success(time.monotonic() - start, kind)
+        finally:
+            self.release()
+
+    async def stream(self, chunks: AsyncIterator[T]) -> AsyncIterator[T]:
+        """
+        Passes a provider stream through, holding a slot only until its first chunk arrives, which is also the
+        latency fed back. The rest depends on the output length and on how fast the consumer reads it.
+        """
+        try:
+            async with self.slot(f"{current_call_site.get()}.first_chunk"):
+                try:
+                    first = await anext(chunks)
+                except StopAsyncIteration:
+                    return
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_overrides: dict[str, dict] = {}
+_lock = threading.Lock()
+_share = 1.0
+_model_shares: dict[str, float] = {}
+
+
+def _default_settings() -> dict:
+    return {
+        "rate": float(os.environ.get("LLM_RATE_LIMIT", 5.0)),
+        "concurrency": float(os.environ.get("LLM_CONCURRENCY", 4.0)),
+    }
+
+
+def get_rate_limiter(model: str) -> AdaptiveRateLimiter:
+    """Returns the process-wide limiter for a model, shared by every LLM client calling it."""
+    limiter = _limiters.get(model)
+    if limiter is not None:
+        return limiter
+    with _lock:
+        if model not in _limiters:
+            limiter = AdaptiveRateLimiter(model, **{**_default_settings(), **_overrides.get(model, {})})
+            share = _model_shares.get(model, _share)
+            if share != 1.0:
+                limiter.scale(share)
+            _limiters[model] = limiter
+        return _limiters[model]
+
+
+def configure_rate_limiter(model: str, **settings):
+    """Sets the starting limits for a model, e.g. configure_rate_limiter("gemini-1.5-pro", rate=1, concurrency=2)."""
+    with _lock:
+        _overrides[model] = settings
+        _limiters.pop(model, None)
+
+
+def set_rate_limit_share(share: float, model_shares: dict[str, float] | None = None):
+    """
+    Gives this process share of every model's limits, e.g. 1 / N in each of N worker processes.
+    model_shares overrides it for models only some of the processes call.
+    """
+    global _share, _model_shares
+    with _lock:
+        _share = share
+        _model_shares = dict(model_shares or {})
+        _limiters.clear()
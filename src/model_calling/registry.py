@@ -0,0 +1,74 @@
+import importlib
+import threading
+
+from model_calling.Hedged import HedgedLLM
+from model_calling.LLM import LLM
+from model_calling.response_cache import ResponseCache
+
+# provider -> "module:class", imported lazily so only the SDKs actually used need to be installed
+PROVIDERS = {
+    "gemini": "model_calling.Gemini:GeminiLLM",
+    "openai": "model_calling.OpenAI:OpenAILLM",
+    "deepseek": "model_calling.DeepSeek:DeepSeekLLM",
+    "llama": "model_calling.Llama:LlamaLLM",
+    "local": "model_calling.Local:LocalLLM",
+}
+
+_llms: dict[tuple, LLM] = {}
+_lock = threading.Lock()
+_default_cache: ResponseCache | None = None
+
+
+def _load_provider(provider: str) -> type[LLM]:
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    module_name, class_name = PROVIDERS[provider].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_llm(provider: str = "gemini", model_name: str | None = None, temperature: float = 1.0,
+            max_output_tokens: int | None = None) -> LLM:
+    """
+    Returns the process-wide LLM client for (provider, model_name, temperature, max_output_tokens),
+    creating it on first use. LLM clients hold no per-conversation state, so every session and simulation
+    can share them along with their connection pools.
+    """
+    key = (provider, model_name, temperature, max_output_tokens)
+    llm = _llms.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        if key not in _llms:
+            llm = _load_provider(provider)(model_name=model_name, temperature=temperature)
+            llm.max_output_tokens = max_output_tokens
+            llm.use_cache(_default_cache)
+            _llms[key] = llm
+        return _llms[key]
+
+
+def get_hedged_llm(provider: str, model_name: str | None, secondary_provider: str, secondary_model_name: str | None,
+                   temperature: float = 1.0, max_output_tokens: int | None = None, **hedge_settings) -> LLM:
+    """Returns the process-wide HedgedLLM that backs the primary model with the secondary one, see model_calling.Hedged."""
+    key = ("hedged", (provider, model_name), (secondary_provider, secondary_model_name), temperature, max_output_tokens)
+    if key not in _llms:
+        primary = get_llm(provider, model_name, temperature)
+        secondary = get_llm(secondary_provider, secondary_model_name, temperature)
+        with _lock:
+            if key not in _llms:
+                _llms[key] = HedgedLLM(primary, secondary, **hedge_settings)
+                _llms[key].max_output_tokens = max_output_tokens
+    return _llms[key]
+
+
+def set_default_cache(cache: ResponseCache | None):
+    """Puts every registry client, existing and future, behind the given response cache (None disables caching)."""
+    global _default_cache
+    with _lock:
+        _default_cache = cache
+        for llm in _llms.values():
+            llm.use_cache(cache)
+
+
+def clear_registry():
+    with _lock:
+        _llms.clear()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from model_calling.metrics import metrics
+from model_calling.rate_limiter import is_rate_limit_error
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMCallError(Exception):
+    """A model call that failed for good: a non-retryable error, attempts or deadline exhausted, or the circuit open."""
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+class CircuitOpenError(LLMCallError):
+    pass
+
+
+def is_retryable(e: BaseException) -> bool:
+    if is_rate_limit_error(e):
+        return True
+    # openai errors carry status_code, google-genai errors carry code
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # network failures from httpx and the SDKs, matched by name so neither has to be imported here
+    return any(word in type(e).__name__ for word in ("Timeout", "Connection", "ServerError", "Network"))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 4, base_delay: float = 2.0, max_delay: float = 30.0, deadline: float = 120.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline  # seconds for the whole call, retries and backoff included
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter, so callers that failed together don't retry together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    max_attempts=int(os.environ.get("LLM_MAX_ATTEMPTS", 4)),
+    deadline=float(os.environ.get("LLM_CALL_DEADLINE", 120.0)),
+)
+
+
+class CircuitBreaker:
+    """
+    Fails calls to a provider fast once it has failed failure_threshold times in a row.
+    After reset_timeout one trial call is let through: success closes the circuit, failure opens it again.
+    Rate-limit errors are not failures, the per-model rate limiters slow down for those instead.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Raises CircuitOpenError if the call may not go ahead. Returns True if it is the half-open trial call."""
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+        metrics.increment(f"resilience.{self.name}.circuit_rejected")
+        raise CircuitOpenError(self.name, "circuit open after repeated failures")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        # a trial that ended without a verdict, e.g. cancelled or a client error, lets the next call try again
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.getLogger().error(f"Circuit opened for {self.name} after {self.failures} failures")
+                    metrics.increment(f"resilience.{self.name}.circuit_opened")
+                self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def _record_failure(breaker: CircuitBreaker, e: Exception) -> bool:
+    retryable = is_retryable(e)
+    # client errors (bad request, auth) say nothing about the provider's health, and rate limits are the limiter's job
+    if retryable and not is_rate_limit_error(e):
+        breaker.record_failure()
+    logging.getLogger().warning(f"{breaker.name} call failed ({'retryable' if retryable else 'not retryable'}): {e!r}")
+    return retryable
+
+
+async def call_with_retries(attempt: Callable[[], Awaitable[T]], breaker: CircuitBreaker,
+                            policy: RetryPolicy = DEFAULT_RETRY_POLICY) -> T:
+    """Runs attempt() until it succeeds, retrying retryable errors with backoff within the policy's attempts and deadline."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline
+    for attempt_number in range(policy.max_attempts):
+        trial = breaker.allow()
+        try:
+            result = await asyncio.wait_for(attempt(), max(0.0, deadline - loop.time()))
+        except Exception as e:
+            if trial:
+                breaker.release_trial()
+            retryable = _record_failure(breaker, e)
+            delay = policy.backoff(attempt_number)
+            if not retryable or attempt_number + 1 == policy.max_attempts or loop.time() + delay >= deadline:
+                metrics.increment(f"resilience.{breaker.name}.failed_calls")
+                raise LLMCallError(breaker.name, f"gave up after {attempt_number + 1} attempt(s): {e!r}") from e
+            metrics.increment(f"resilience.{breaker.name}.retries")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # cancelled, e.g. a hedge that lost or a discarded speculation
+            if trial:
+                breaker.release_trial()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+async def stream_with_retries(open_stream: Callable[[], AsyncIterator[str]], breaker: CircuitBreaker,
+                              policy: RetryPolicy = DEFAULT_RETRY_POLICY) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of call_with_retries. Retries only happen before the first chunk, since text already
+    passed on can't be taken back. Every chunk has to arrive before the deadline.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline
+    for attempt_number in range(policy.max_attempts):
+        trial = breaker.allow()
+        received = False
+        stream = open_stream()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                received = True
+                yield chunk
+        except Exception as e:
+            retryable = _record_failure(breaker, e)
+            delay = policy.backoff(attempt_number)
+            if received or not retryable or attempt_number + 1 == policy.max_attempts or loop.time() + delay >= deadline:
+                metrics.increment(f"resilience.{breaker.name}.failed_calls")
+                raise LLMCallError(breaker.name, f"stream failed after {attempt_number + 1} attempt(s): {e!r}") from e
+            metrics.increment(f"resilience.{breaker.name}.retries")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return
+        finally:
+            # also covers a cancelled or abandoned stream
+            if trial:
+                breaker.release_trial()
+            await stream.aclose()
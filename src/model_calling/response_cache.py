@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple
+
+from model_calling.metrics import metrics
+
+
+class CacheSlot(NamedTuple):
+    id: str
+    readable: bool
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses: a bounded in-memory LRU in front of a SQLite store.
+
+    Requests at temperature 0 are deterministic, so any stored response is served.
+    Sampled requests (temperature > 0) are always recorded, the n-th identical request in a process being
+    stored as the n-th sample, but they are only served back when replay=True. Replay then hands out the
+    recorded samples in the same order, so a re-run sees the same sequence of responses as the recorded run.
+
+    The SQLite store is pruned to max_disk_bytes and max_age_seconds when opened and again after every
+    prune_every_bytes of new responses, so the limits also hold during a long run.
+    """
+    def __init__(self, path: str = "llm_cache.sqlite", max_memory_entries: int = 1024,
+                 max_disk_bytes: int | None = 500_000_000, max_age_seconds: float | None = None, replay: bool = False,
+                 prune_every_bytes: int = 1_000_000):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self.replay = replay
+        self.prune_every_bytes = prune_every_bytes
+        self.written_since_prune = 0
+        self.memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.occurrences: dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                slot TEXT PRIMARY KEY,
+                response TEXT,
+                created REAL,
+                size INTEGER
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self.connection.commit()
+        self.prune()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str | None, user_prompt, temperature: float, max_tokens: int, seed: int | None) -> str:
+        payload = json.dumps([model, system_prompt, user_prompt, temperature, max_tokens, seed], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def slot(self, key: str, temperature: float) -> CacheSlot:
+        if temperature == 0:
+            return CacheSlot(key, True)
+        with self.lock:
+            occurrence = self.occurrences[key]
+            self.occurrences[key] += 1
+        return CacheSlot(f"{key}:{occurrence}", self.replay)
+
+    async def get(self, slot: CacheSlot) -> str | None:
+        if not slot.readable:
+            return None
+        response = self._get_memory(slot.id)
+        if response is None:
+            response = await asyncio.to_thread(self._get_disk, slot.id)
+            if response is not None:
+                self._put_memory(slot.id, response, time.time())
+        metrics.increment("cache.hit" if response is not None else "cache.miss")
+        return response
+
+    async def put(self, slot: CacheSlot, response: str):
+        if not response:
+            return
+        created = time.time()
+        self._put_memory(slot.id, response, created)
+        await asyncio.to_thread(self._put_disk, slot.id, response, created)
+
+    def _expired(self, created: float) -> bool:
+        return self.max_age_seconds is not None and time.time() - created > self.max_age_seconds
+
+    def _get_memory(self, slot_id: str) -> str | None:
+        with self.lock:
+            entry = self.memory.get(slot_id)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                del self.memory[slot_id]
+                return None
+            self.memory.move_to_end(slot_id)
+            return entry[0]
+
+    def _put_memory(self, slot_id: str, response: str, created: float):
+        with self.lock:
+            self.memory[slot_id] = (response, created)
+            self.memory.move_to_end(slot_id)
+            while len(self.memory) > self.max_memory_entries:
+                self.memory.popitem(last=False)
+
+    def _get_disk(self, slot_id: str) -> str | None:
+        with self.lock:
+            row = self.connection.execute("SELECT response, created FROM responses WHERE slot = ?", (slot_id,)).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return row[0]
+
+    def _put_disk(self, slot_id: str, response: str, created: float):
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (slot, response, created, size) VALUES (?, ?, ?, ?)",
+                (slot_id, response, created, size)
+            )
+            self.connection.commit()
+            self.written_since_prune += size
+            due = self.written_since_prune >= self.prune_every_bytes
+            if due:
+                self.written_since_prune = 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Drops entries older than max_age_seconds, then the oldest entries until the store fits max_disk_bytes."""
+        with self.lock:
+            if self.max_age_seconds is not None:
+                self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,))
+            if self.max_disk_bytes is not None:
+                total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_disk_bytes:
+                    excess = total - self.max_disk_bytes
+                    freed = 0
+                    stale = []
+                    for slot_id, size in self.connection.execute("SELECT slot, size FROM responses ORDER BY created"):
+                        if freed >= excess:
+                            break
+                        stale.append((slot_id,))
+                        freed += size
+                    self.connection.executemany("DELETE FROM responses WHERE slot = ?", stale)
+                    logging.getLogger().info(f"Evicted {len(stale)} cached responses ({freed} bytes)")
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
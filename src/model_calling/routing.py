@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+from typing import NamedTuple
+
+from model_calling.LLM import LLM
+from model_calling.registry import get_llm, get_hedged_llm
+
+ROLES = ("agent", "evaluator", "goal_generator", "judge", "planner", "summariser")
+
+
+class Route(NamedTuple):
+    provider: str = "gemini"
+    model_name: str | None = None  # None uses the provider's default model
+    max_tokens: int | None = None  # caps every call made for the role, None keeps each call's own limit
+    temperature: float = 1.0
+    hedge: str | None = None  # "provider:model" to hedge slow calls with, see model_calling.Hedged
+
+
+def load_routes(path: str | None = None) -> dict[str, Route]:
+    """
+    Reads role routes from a JSON file (LLM_ROUTING_CONFIG by default), for example
+    {"judge": {"model": "gemini-2.0-flash-lite", "max_tokens": 5, "temperature": 0},
+     "agent": {"model": "gemini-2.0-flash-001", "hedge": "openai:gpt-4o-mini"}}
+    Roles missing from the file keep using whatever model their caller passes in.
+    """
+    path = path or os.environ.get("LLM_ROUTING_CONFIG")
+    if not path:
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+    routes = {}
+    for role, settings in config.items():
+        if role not in ROLES:
+            raise ValueError(f"Unknown model role in {path}: {role}")
+        routes[role] = Route(
+            provider=settings.get("provider", "gemini"),
+            model_name=settings.get("model"),
+            max_tokens=settings.get("max_tokens"),
+            temperature=settings.get("temperature", 1.0),
+            hedge=settings.get("hedge"),
+        )
+    logging.getLogger().info(f"Model routes: {routes}")
+    return routes
+
+
+routes: dict[str, Route] = load_routes()
+
+
+def set_routes(new_routes: dict[str, Route]):
+    global routes
+    routes = new_routes
+
+
+def get_role_llm(role: str, default: LLM | None = None) -> LLM:
+    """
+    Returns the shared LLM client routed to role. Unrouted roles get default, or the registry's default client
+    when no default is given, so callers keep their current model unless the config says otherwise.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown model role: {role}")
+    route = routes.get(role)
+    if route is None:
+        return default if default is not None else get_llm()
+    if route.hedge:
+        hedge_provider, _, hedge_model = route.hedge.partition(":")
+        return get_hedged_llm(route.provider, route.model_name, hedge_provider, hedge_model or None,
+                              route.temperature, max_output_tokens=route.max_tokens)
+    return get_llm(route.provider, route.model_name, route.temperature, max_output_tokens=route.max_tokens)
@@ -0,0 +1,47 @@
+import hashlib
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+def derive_seed(*parts) -> int:
+    """A seed that only depends on parts, unlike hash() it is the same in every process and run."""
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") >> 1
+
+
+class CallSeeds:
+    """
+    Hands out the provider seed for each model call made within one seeded unit of work, e.g. a simulation.
+    A call's seed comes from the unit's seed, its call site and how many calls that site made before it. Calls from
+    one site run one after another, so the n-th call of a site gets the same seed however the calls interleave.
+    """
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.calls: dict[str, int] = defaultdict(int)
+
+    def next(self, call_site: str) -> int:
+        self.calls[call_site] += 1
+        return derive_seed(self.seed, call_site, self.calls[call_site])
+
+
+# seeds of the unit of work making the current model call, None leaves calls at the client's own seed
+current_seeds: ContextVar[CallSeeds | None] = ContextVar("current_seeds", default=None)
+# seed of the model call in progress, set by LLM.chat_messages and read by the providers and the response cache
+current_call_seed: ContextVar[int | None] = ContextVar("current_call_seed", default=None)
+
+
+@contextmanager
+def seeded(seed: int | None):
+    """Seeds every model call made inside the block, including from tasks it starts, from seed (None: no seeding)."""
+    token = current_seeds.set(CallSeeds(seed) if seed is not None else None)
+    try:
+        yield
+    finally:
+        current_seeds.reset(token)
+
+
+def next_call_seed(call_site: str, default: int | None = None) -> int | None:
+    seeds = current_seeds.get()
+    return seeds.next(call_site) if seeds is not None else default
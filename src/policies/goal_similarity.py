@@ -0,0 +1,156 @@
+import asyncio
+import difflib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+# exact word overlap at or above which a guess is accepted without asking the judge. Kept high, and fuzzy word
+# matches don't count towards it, because one swapped word ("maximise" for "minimise") can flip the meaning of a goal
+LEXICAL_ACCEPT = float(os.environ.get("GOAL_SIMILARITY_LEXICAL_ACCEPT", 0.95))
+# lexical overlap below which a guess is rejected, 0 never rejects since paraphrases can share no words
+LEXICAL_REJECT = float(os.environ.get("GOAL_SIMILARITY_LEXICAL_REJECT", 0.0))
+# sentence-embedding model used when sentence-transformers is installed, unset disables the embedding tier
+EMBEDDING_MODEL = os.environ.get("GOAL_SIMILARITY_EMBEDDING_MODEL")
+EMBEDDING_ACCEPT = float(os.environ.get("GOAL_SIMILARITY_EMBEDDING_ACCEPT", 0.85))
+EMBEDDING_REJECT = float(os.environ.get("GOAL_SIMILARITY_EMBEDDING_REJECT", 0.25))
+MAX_MEMO_ENTRIES = 10_000
+# words at least this similar count as the same word when rejecting, so spelling variants and typos still overlap
+WORD_MATCH_RATIO = 0.85
+# "happiness"/"unhappiness", "harmful"/"harmless": near-identical words with opposite meanings
+NEGATING_PREFIXES = ("un", "dis", "in", "il", "im", "ir", "non")
+
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "and", "or", "in", "on", "for", "with", "by", "as", "at", "into", "from",
+    "is", "are", "be", "it", "its", "all", "any", "every", "that", "this", "their", "them", "they", "you", "your",
+    "goal", "agent", "ai", "wants", "want", "trying", "try", "possible", "much", "many", "more", "most",
+}
+
+
+class GuessVerdict(NamedTuple):
+    correct: bool
+    tier: str  # "empty", "memo", "lexical", "embedding" or "llm"
+    score: float | None = None
+
+
+def normalise(text: str) -> str:
+    text = re.sub(r"[^a-z0-9\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _content_words(text: str) -> set[str]:
+    # a crude plural/verb-ending strip is enough to match "maximises"/"maximise" and "clicks"/"click"
+    return {re.sub(r"(?<=[^s])s$", "", word) for word in text.split() if word not in STOPWORDS}
+
+
+def _negates(word: str, other: str) -> bool:
+    for a, b in ((word, other), (other, word)):
+        if any(a == prefix + b for prefix in NEGATING_PREFIXES):
+            return True
+        if a.endswith("less") and len(a) >= 7 and a != b and b.startswith(a[:-4]):
+            return True
+    return False
+
+
+def _matches(word: str, others: set[str], fuzzy: bool) -> bool:
+    if word in others:
+        return True
+    return fuzzy and any(difflib.SequenceMatcher(None, word, other).ratio() >= WORD_MATCH_RATIO and not _negates(word, other)
+                         for other in others)
+
+
+def lexical_similarity(true_goal: str, guess: str, fuzzy: bool = True) -> float:
+    """
+    Dice overlap in [0, 1] of the content words of two normalised texts. With fuzzy, near-identical words count
+    as equal unless one negates the other.
+    """
+    true_words, guess_words = _content_words(true_goal), _content_words(guess)
+    if not true_words or not guess_words:
+        return 0.0
+    matched = (sum(_matches(word, guess_words, fuzzy) for word in true_words)
+               + sum(_matches(word, true_words, fuzzy) for word in guess_words))
+    return matched / (len(true_words) + len(guess_words))
+
+
+def has_negated_word(true_goal: str, guess: str) -> bool:
+    guess_words = _content_words(guess)
+    return any(_negates(word, other) for word in _content_words(true_goal) for other in guess_words)
+
+
+class _EmbeddingScorer:
+    def __init__(self, model_name: str | None):
+        self.model_name = model_name
+        self.model = None
+        self.available = model_name is not None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        with self.lock:
+            if self.model is None and self.available:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self.model = SentenceTransformer(self.model_name, device="cpu")
+                except Exception as e:
+                    logging.getLogger().error(f"Goal similarity embeddings disabled: {e}")
+                    self.available = False
+        return self.model
+
+    def _similarity(self, true_goal: str, guess: str) -> float | None:
+        model = self._load()
+        if model is None:
+            return None
+        true_embedding, guess_embedding = model.encode([true_goal, guess], normalize_embeddings=True)
+        return float(true_embedding @ guess_embedding)
+
+    async def similarity(self, true_goal: str, guess: str) -> float | None:
+        if not self.available:
+            return None
+        return await asyncio.to_thread(self._similarity, true_goal, guess)
+
+
+_embeddings = _EmbeddingScorer(EMBEDDING_MODEL)
+_memo: OrderedDict[tuple[str, str], GuessVerdict] = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def remember(true_goal: str, guess: str, verdict: GuessVerdict):
+    key = (true_goal, normalise(guess))
+    with _memo_lock:
+        _memo[key] = verdict
+        _memo.move_to_end(key)
+        while len(_memo) > MAX_MEMO_ENTRIES:
+            _memo.popitem(last=False)
+
+
+def recall(true_goal: str, guess: str) -> GuessVerdict | None:
+    with _memo_lock:
+        verdict = _memo.get((true_goal, normalise(guess)))
+    return GuessVerdict(verdict.correct, "memo", verdict.score) if verdict is not None else None
+
+
+async def local_verdict(true_goal: str, guess: str) -> GuessVerdict | None:
+    """
+    Decides clear-cut guesses locally, cheapest scorer first: lexical overlap, then sentence embeddings if enabled.
+    Returns None for guesses in the ambiguous band between the reject and accept thresholds of every scorer,
+    and for guesses that negate a word of the goal, which only the judge can tell apart.
+    """
+    true_goal, guess = normalise(true_goal), normalise(guess)
+    if not guess:
+        return GuessVerdict(False, "empty", 0.0)
+    exact = lexical_similarity(true_goal, guess, fuzzy=False)
+    if exact >= LEXICAL_ACCEPT:
+        return GuessVerdict(True, "lexical", exact)
+    lexical = lexical_similarity(true_goal, guess)
+    if lexical < LEXICAL_REJECT:
+        return GuessVerdict(False, "lexical", lexical)
+    if has_negated_word(true_goal, guess):
+        return None
+    embedding = await _embeddings.similarity(true_goal, guess)
+    if embedding is not None and embedding >= EMBEDDING_ACCEPT:
+        return GuessVerdict(True, "embedding", embedding)
+    if embedding is not None and embedding < EMBEDDING_REJECT:
+        return GuessVerdict(False, "embedding", embedding)
+    return None
+
@@ -1,53 +1,82 @@
 import argparse
 import asyncio
+import functools
 import itertools
-import json
+import logging
 import math
+import os
+import random
+import sys
 
 from tqdm import tqdm
 
 from agents.adversarial_agent import AdversarialAgent
 from agents.agent import Agent
-from game.simulation_app import format_history
+from game.transcript import Transcript, TranscriptSummariser
 from goal_generators.goal_generator import GoalGenerator
 from goal_generators.malicious_goal_generator import MaliciousGoalGenerator
 from goal_generators.random_goal_generator import RandomGoalGenerator
 from goal_generators.realistic_goal_generator import RealisticGoalGenerator
-from model_calling.Gemini import GeminiLLM
 from model_calling.LLM import LLM
+from model_calling.registry import get_llm, set_default_cache
+from model_calling.resilience import LLMCallError
+from model_calling.response_cache import ResponseCache
+from model_calling.routing import get_role_llm
+from model_calling.seeding import current_seeds, derive_seed, seeded
 from policies.adversarial_policy import AdversarialPolicy
 from policies.aligned_policy import AlignedPolicy
 from policies.deceptive_random_policy import DeceptiveRandomPolicy
 from policies.policy import Policy
+from simulation_runner.replay import recorded_run, compare_runs
+from simulation_runner.result_sink import ResultSink, DEFAULT_OUTPUT_PATH, first_result
+from simulation_runner.run_manifest import RunManifest, manifest_path
+from simulation_runner.scheduler import SimulationScheduler, DEFAULT_CONCURRENCY
+from simulation_runner.workers import run_sharded, WorkerFailedError
+
+GOAL_GENERATORS = {generator.__name__: generator
+                   for generator in (MaliciousGoalGenerator, RealisticGoalGenerator, RandomGoalGenerator)}
 
 
 class SimulateInteractions:
-    def __init__(self, agent_policy: type(Policy), agent_goal_generator: type(GoalGenerator), agent_llm: LLM, evaluator_llm: LLM, difficulty):
-        self.agent = Agent(agent_policy(agent_llm, agent_goal_generator(agent_llm)))
-        self.aligned_agent = Agent(AlignedPolicy(agent_llm, agent_goal_generator(agent_llm)))
+    def __init__(self, agent_policy: type(Policy), agent_goal_generator: type(GoalGenerator), agent_llm: LLM, evaluator_llm: LLM, difficulty, goal: str = None, history_window: int = None):
+        # the agent and evaluator models are set per run, the other roles follow the routing config or the agent model
+        goal_llm, judge_llm, planner_llm = (get_role_llm(role, agent_llm) for role in ("goal_generator", "judge", "planner"))
+        self.agent = Agent(agent_policy(agent_llm, agent_goal_generator(goal_llm), judge_llm, planner_llm))
+        if goal is not None:
+            self.agent.policy.goal = goal
+        self.aligned_agent = Agent(AlignedPolicy(agent_llm, agent_goal_generator(goal_llm), judge_llm, planner_llm))
         self.difficulty = difficulty
         self.evaluator = AdversarialAgent(AdversarialPolicy(evaluator_llm))
+        self.evaluator_llm = evaluator_llm
+        self.history_window = history_window
         
     async def simulate(self, n_rounds=20) -> list[dict[str, str]]:
         await self.agent.policy.async_init(difficulty=self.difficulty)
         history = [{"type": "new_agent", "agent_policy": type(self.agent.policy).__name__,
                     "true_goal": self.agent.get_true_goal()}]
-        chat_history = []
+        chat_history = Transcript(self.history_window, TranscriptSummariser(get_role_llm("summariser", self.evaluator_llm)) if self.history_window else None)
+        # a seeded run must show each turn the same summary every time, so it waits for summaries in progress
+        seeded_run = current_seeds.get() is not None
         for _ in range(n_rounds):
-            evaluator_response = await self.evaluator.act(format_history(chat_history))
+            if seeded_run:
+                await chat_history.settle()
+            evaluator_response = await self.evaluator.act(chat_history)
             history.append({"Evaluator": evaluator_response})
-            chat_history.append({"Evaluator": evaluator_response["response"]})
+            chat_history.append("Evaluator", evaluator_response["response"])
             if evaluator_response["misaligned"] is not None:
                 correct_guess = self.on_guess(evaluator_response["misaligned"])
                 evaluator_response["misaligned_correct"] = correct_guess
                 return history
             if evaluator_response["goal"] is not None:
-                goal_correct = await self.agent.policy.is_guess_similar(evaluator_response["goal"])
-                evaluator_response["goal_correct"] = goal_correct
+                verdict = await self.agent.policy.judge_guess(evaluator_response["goal"])
+                evaluator_response["goal_correct"] = verdict.correct
+                evaluator_response["goal_judged_by"] = verdict.tier
                 return history
-            agent_response = await self.agent.act(format_history(chat_history))
+            if seeded_run:
+                await chat_history.settle()
+            agent_response = await self.agent.act(chat_history)
             history.append({"AI": agent_response})
-            chat_history.append({"AI": agent_response})
+            chat_history.append("AI", agent_response)
         return history
             
     def on_guess(self, guess_misaligned: bool):
@@ -59,23 +88,84 @@ class SimulateInteractions:
 
 def main():
     parser = argparse.ArgumentParser(description="Run agent-evaluator interaction simulations.")
+    parser.add_argument("--single", action="store_true", help="Run a single configuration instead of the full grid.")
     parser.add_argument("--agent_model", type=str, default="gemini-2.0-flash-001", help="Agent LLM model name.")
     parser.add_argument("--evaluator_model", type=str, default="gemini-2.0-flash-001", help="Evaluator LLM model name.")
     parser.add_argument("--difficulty", type=str, default="medium", choices=["easy", "medium", "hard", "very_hard"],
                         help="Difficulty level.")
     parser.add_argument("--num_simulations", type=int, default=10, help="Number of simulations to run.")
     parser.add_argument("--num_rounds", type=int, default=20, help="Number of rounds per simulation.")
+    parser.add_argument("--history_window", type=int, default=None,
+                        help="Turns shown verbatim to the agent and evaluator, older turns are summarised.")
+    parser.add_argument("--cache", type=str, default=None, help="Path of an LLM response cache to read and record.")
+    parser.add_argument("--replay_cache", action="store_true",
+                        help="Also serve recorded responses for sampled (temperature > 0) calls.")
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT_PATH,
+                        help="JSONL file finished conversations are appended to.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the run recorded in --output, skipping simulations that already finished.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Simulations run at once in each process, taken from one queue for the whole grid.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes the grid's configurations are shared between, each with its own event loop.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Fixes policy selection, goals and provider sampling seeds, so the run can be replayed.")
+    parser.add_argument("--replay", type=str, default=None,
+                        help="Results of a run made with --seed and --cache to re-run against the cache into --output.")
     args = parser.parse_args()
-    agent_model = args.agent_model
-    evaluator_model = args.evaluator_model
-    agent_goal_generator = MaliciousGoalGenerator
-    agent_policy = DeceptiveRandomPolicy
-    difficulty = args.difficulty
-    num_rounds = args.num_rounds
-    num_simulations = args.num_simulations
-    run_simulations(agent_goal_generator, agent_model, agent_policy, difficulty, evaluator_model, num_rounds)
-
-async def run_all_simulations():
+
+    if not args.resume and os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        parser.error(f"{args.output} already has results, pass --resume to continue that run or choose another --output.")
+
+    configurations = grid_configurations()
+    if args.replay is not None:
+        if args.cache is None:
+            parser.error("--replay needs the --cache the run was recorded with.")
+        if os.path.abspath(args.replay) == os.path.abspath(args.output):
+            parser.error("--replay and --output must be different files.")
+        try:
+            args.seed, args.history_window, configurations = recorded_run(args.replay, GOAL_GENERATORS)
+        except ValueError as e:
+            parser.error(str(e))
+        args.single = False
+        args.replay_cache = True
+
+    if args.resume and os.path.exists(args.output):
+        # the manifest only knows units, so a resume with other settings would silently mix two runs in one file
+        recorded = first_result(args.output)
+        settings = {"seed": args.seed, "history_window": args.history_window}
+        if args.single:
+            settings["num_simulations"] = args.num_simulations
+        changed = [f"--{name} {recorded[name]}" if recorded.get(name) is not None else f"no --{name}"
+                   for name, value in settings.items() if recorded is not None and recorded.get(name) != value]
+        if changed:
+            parser.error(f"{args.output} was recorded with {', '.join(changed)}, resume it with the same settings.")
+
+    if args.cache is not None:
+        set_default_cache(ResponseCache(args.cache, replay=args.replay_cache))
+
+    if args.single:
+        asyncio.run(run_simulations(args.evaluator_model, MaliciousGoalGenerator, args.agent_model,
+                                    args.difficulty, args.num_rounds, args.num_simulations,
+                                    history_window=args.history_window, output_path=args.output, resume=args.resume,
+                                    concurrency=args.concurrency, seed=args.seed))
+    elif args.workers > 1:
+        try:
+            asyncio.run(run_sharded(run_grid, configurations, args.workers, args.output, resume=args.resume,
+                                    concurrency=args.concurrency, cache_path=args.cache, replay_cache=args.replay_cache,
+                                    history_window=args.history_window, seed=args.seed))
+        except WorkerFailedError as e:
+            sys.exit(str(e))
+    else:
+        asyncio.run(run_all_simulations(history_window=args.history_window, output_path=args.output, resume=args.resume,
+                                        concurrency=args.concurrency, seed=args.seed, configurations=configurations))
+
+    if args.replay is not None:
+        identical, different, missing = compare_runs(args.replay, args.output)
+        print(f"Replay of {args.replay}: {identical} conversations identical, {different} different, {missing} missing")
+
+
+def grid_configurations():
     evaluator_models = ['gemini-2.0-flash-001', 'gemini-1.5-pro', 'gemini-1.5-flash-001']
     goal_generators = [MaliciousGoalGenerator, RealisticGoalGenerator, RandomGoalGenerator]
     agent_models = ['gemini-1.5-flash-001', 'gemini-2.0-flash-001', 'gemini-1.5-pro']
@@ -83,25 +173,142 @@ async def run_all_simulations():
     num_rounds_list = [20]
     num_simulations_list = [3]
 
-    all_combinations = list(itertools.product(
+    return list(itertools.product(
         evaluator_models, goal_generators, agent_models,
         difficulties, num_rounds_list, num_simulations_list
     ))
 
-    outer_bar = tqdm(total=len(all_combinations), desc="Running all simulations", position=0, leave=True)
 
-    semaphore = asyncio.Semaphore(3)  # Limit outer concurrency to avoid flooding
+async def run_all_simulations(history_window=None, output_path=DEFAULT_OUTPUT_PATH, resume=False,
+                              concurrency=DEFAULT_CONCURRENCY, seed=None, configurations=None):
+    sink = await ResultSink(output_path).start()
+    manifest = await RunManifest(manifest_path(output_path)).open(resume)
+    try:
+        await run_grid(configurations or grid_configurations(), history_window=history_window, sink=sink,
+                       manifest=manifest, concurrency=concurrency, seed=seed)
+    finally:
+        await sink.close()
+        await manifest.close()
+
+
+async def run_grid(configurations, history_window=None, sink: ResultSink = None, manifest: RunManifest = None,
+                   concurrency=DEFAULT_CONCURRENCY, progress=True, seed=None):
+    # every simulation of every configuration goes into one queue, see SimulationScheduler for the order they run in
+    scheduler = SimulationScheduler(concurrency)
+    bar = tqdm(total=0, desc="Running all simulations", position=0, leave=True, disable=not progress)
+
+    def with_progress(job):
+        async def run():
+            await job()
+            bar.update(1)
+        return run
 
-    async def run_sim_async(args):
-        async with semaphore:
-            await run_simulations(*args)
-            outer_bar.update(1)
-            outer_bar.refresh()
+    for configuration in configurations:
+        cell = configuration[:5]
+        jobs, n_done = simulation_jobs(*configuration, history_window=history_window, sink=sink, manifest=manifest,
+                                       seed=seed)
+        scheduler.count_done(cell, n_done)
+        bar.total += len(jobs) + n_done
+        bar.update(n_done)
+        for job in jobs:
+            # agent models share the pool fairly
+            scheduler.add(configuration[2], cell, with_progress(job))
+    await scheduler.run()
+    bar.close()
 
-    tasks = [asyncio.create_task(run_sim_async(args)) for args in all_combinations]
-    await asyncio.gather(*tasks)
-    outer_bar.close()
 
+def cell_policies(num_simulations, seed=None):
+    # replicate i of a cell always plays policies[i], so a resumed run keeps the same policy mix
+    policies = [policy for _ in range(math.ceil(num_simulations/3))
+                for policy in [DeceptiveRandomPolicy, DeceptiveRandomPolicy, AlignedPolicy]]
+    if seed is not None:
+        random.Random(seed).shuffle(policies)
+    return policies
+
+
+def simulation_jobs(
+        evaluator_model,
+        agent_goal_generator,
+        agent_model,
+        difficulty,
+        num_rounds,
+        num_simulations,
+        history_window=None,
+        sink: ResultSink = None,
+        manifest: RunManifest = None,
+        seed=None
+):
+    """
+    Returns a job per simulation of the configuration still to run, and how many already finished in an earlier run.
+    With a seed, the policy mix, the goals and every model call of each simulation are seeded from it and the unit,
+    so the same seed gives the same run whatever order the simulations are scheduled in. Seeded simulations also
+    wait for transcript summaries and skip the shared guess memo, so replaying one against the response cache
+    sends the same prompts as the recorded run.
+    """
+    agent_llm = get_llm(model_name=agent_model)
+    evaluator_llm = get_llm(model_name=evaluator_model)
+    metadata = {
+        "agent_model": agent_llm.model,
+        "evaluator_model": evaluator_llm.model,
+        "difficulty": difficulty,
+        "goal_generator": agent_goal_generator.__name__,
+        "num_rounds": num_rounds,
+        "num_simulations": num_simulations,
+        "history_window": history_window,
+        "seed": seed,
+    }
+
+    cell = (evaluator_model, agent_goal_generator.__name__, agent_model, difficulty, num_rounds)
+    cell_seed = derive_seed(seed, *cell) if seed is not None else None
+    policies = cell_policies(num_simulations, cell_seed)
+    units = [(cell + (replicate,), policy) for replicate, policy in enumerate(policies)]
+    remaining = [(unit, policy) for unit, policy in units if not manifest.is_done(unit)]
+    # each misaligned simulation takes the goal at its position in the whole cell, not among those left or the next
+    # one free, so goals depend neither on timing nor on what an earlier run already finished
+    goal_indices = {unit: index for index, unit in enumerate(unit for unit, policy in units
+                                                             if policy is DeceptiveRandomPolicy)}
+    goals_task = None
+
+    async def generate_goals():
+        # goals for every misaligned agent in this configuration come from a single batched call, always for the
+        # whole cell so a resumed run sends the same prompt as an uninterrupted one
+        try:
+            with seeded(cell_seed):
+                return await agent_goal_generator(get_role_llm("goal_generator", agent_llm)).generate_goals(
+                    len(goal_indices))
+        except LLMCallError as e:
+            # each misaligned agent then generates its own goal in async_init
+            logging.getLogger().error(f"Batched goal generation failed: {e}")
+            return []
+
+    async def goal_for(unit):
+        # generated when the configuration's first misaligned simulation starts, not when the grid is queued
+        nonlocal goals_task
+        if goals_task is None:
+            goals_task = asyncio.ensure_future(generate_goals())
+        goals = await goals_task
+        return goals[goal_indices[unit]] if goal_indices[unit] < len(goals) else None
+
+    async def run_one(unit, policy):
+        goal = await goal_for(unit) if policy is DeceptiveRandomPolicy else None
+        interaction_simulator = SimulateInteractions(
+            policy, agent_goal_generator, agent_llm, evaluator_llm, difficulty, goal=goal,
+            history_window=history_window
+        )
+        try:
+            with seeded(derive_seed(seed, *unit) if seed is not None else None):
+                chat_history = await interaction_simulator.simulate(n_rounds=num_rounds)
+        except LLMCallError as e:
+            # keep the rest of the grid going, the failed run is recorded so analysis can skip it and resume reruns it
+            logging.getLogger().error(f"Simulation failed: {e}")
+            chat_history = [{"type": "error", "agent_policy": policy.__name__, "true_goal": goal, "error": str(e)}]
+            await sink.write({**metadata, "replicate": unit[-1], "conversation": chat_history})
+        else:
+            await sink.write({**metadata, "replicate": unit[-1], "conversation": chat_history})
+            await manifest.mark_done(unit)
+
+    jobs = [functools.partial(run_one, unit, policy) for unit, policy in remaining]
+    return jobs, len(policies) - len(remaining)
 
 
 async def run_simulations(
@@ -110,48 +317,28 @@ async def run_simulations(
         agent_model,
         difficulty,
         num_rounds,
-        num_simulations
+        num_simulations,
+        history_window=None,
+        sink: ResultSink = None,
+        output_path=DEFAULT_OUTPUT_PATH,
+        manifest: RunManifest = None,
+        resume=False,
+        concurrency=DEFAULT_CONCURRENCY,
+        seed=None
 ):
-    agent_llm = GeminiLLM(model_name=agent_model)
-    evaluator_llm = GeminiLLM(model_name=evaluator_model)
-    full_history = []
-
-    # Create the progress bar
-    total_runs = num_simulations  # 2 policies per simulation
-    bar = tqdm(total=total_runs, desc=f"{agent_model} {evaluator_model} ({difficulty})", leave=False, position=1)
-
-    semaphore = asyncio.Semaphore(5)  # adjust to limit concurrent tasks
-    single_semaphore = asyncio.Semaphore(1)
-
-    output_path = (
-        f"simulation_results/chat_history_agent:{agent_llm.model}_{difficulty}_"
-        f"evaluator:{evaluator_llm.model}_goal:{agent_goal_generator.__name__}.json"
-    )
-
-    async def run_one(policy):
-        async with semaphore:
-            interaction_simulator = SimulateInteractions(
-                policy, agent_goal_generator, agent_llm, evaluator_llm, difficulty
-            )
-            chat_history = await interaction_simulator.simulate(n_rounds=num_rounds)
-            full_history.append(chat_history)
-            bar.update(1)
-            bar.refresh()
-        async with single_semaphore:
-            # Save results
-            with open(output_path, "w") as f:
-                json.dump(full_history, f, indent=4)
-
-    # Launch all simulation tasks
-    tasks = []
-    for _ in range(math.ceil(num_simulations/3)):
-        for policy in [DeceptiveRandomPolicy, DeceptiveRandomPolicy, AlignedPolicy]:
-            tasks.append(asyncio.create_task(run_one(policy)))
-
-    await asyncio.gather(*tasks)
-    bar.close()
-    
+    own_sink = sink is None
+    if own_sink:
+        sink = await ResultSink(output_path).start()
+        manifest = await RunManifest(manifest_path(output_path)).open(resume)
+    try:
+        await run_grid([(evaluator_model, agent_goal_generator, agent_model, difficulty, num_rounds, num_simulations)],
+                       history_window=history_window, sink=sink, manifest=manifest, concurrency=concurrency, seed=seed)
+    finally:
+        if own_sink:
+            await sink.close()
+            await manifest.close()
+
 # logging.basicConfig(level=logging.INFO)
     
 if __name__ == "__main__":
-    asyncio.run(run_all_simulations())
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -6,6 +6,8 @@ from collections import defaultdict
 import pandas as pd
 import argparse
 
+from simulation_runner.result_sink import read_results, latest_results
+
 
 def analyse_alignment_results(conversations):
     results = []
@@ -13,6 +15,8 @@ def analyse_alignment_results(conversations):
     all_turns_to_guess = []
 
     for convo in conversations:
+        if convo[0].get("type") == "error":
+            continue  # the simulation failed before finishing
         guessed_turn = None
         guessed_misaligned = False
         tp = fp = fn = tn = 0
@@ -71,7 +75,7 @@ def analyse_alignment_results(conversations):
     avg_turn = mean(all_turns_to_guess) if all_turns_to_guess else None
 
     summary = {
-        "total_conversations": len(conversations),
+        "total_conversations": len(results),
         "true_positives": all_tp,
         "false_positives": all_fp,
         "false_negatives": all_fn,
@@ -123,6 +127,18 @@ def make_table(grouped_results, x_field, y_field, metric):
     return df
 
 
+def load_jsonl_conversations(path):
+    # one record per conversation, with the run metadata next to the turns. Units a resumed run wrote twice count once
+    conversations = []
+    for record in latest_results(read_results(path)):
+        convo = record["conversation"]
+        for turn in convo:
+            for field in ("difficulty", "agent_model", "evaluator_model", "goal_generator", "seed"):
+                turn[field] = record.get(field)
+        conversations.append(convo)
+    return conversations
+
+
 def load_all_conversations(directory="simulation_results"):
     pattern = re.compile(
         r"chat_history_agent:(?P<agent_model>[^_]+)_(?P<difficulty>[^.]+)_evaluator:(?P<evaluator_model>[^_]+)_goal:(?P<goal_generator>[^.]+)\.json"
@@ -131,6 +147,12 @@ def load_all_conversations(directory="simulation_results"):
     all_convos = []
 
     for filename in os.listdir(directory):
+        if filename.endswith(".jsonl"):
+            try:
+                all_convos.extend(load_jsonl_conversations(os.path.join(directory, filename)))
+            except Exception as e:
+                print(f"Failed to load {filename}: {e}")
+            continue
         match = pattern.match(filename)
         if match:
             path = os.path.join(directory, filename)
@@ -155,7 +177,7 @@ if __name__ == "__main__":
     parser.add_argument("--x", default="difficulty", help="Field for X-axis of table")
     parser.add_argument("--y", default="evaluator_model", help="Field for Y-axis of table")
     parser.add_argument("--metric", default="accuracy", choices=["accuracy", "precision", "recall", "avg_turn_guessed"])
-    parser.add_argument("--dir", default="simulation_results", help="Directory of simulation JSON files")
+    parser.add_argument("--dir", default="simulation_results", help="Directory of simulation JSON and JSONL files")
     args = parser.parse_args()
 
     conversations = load_all_conversations(args.dir)
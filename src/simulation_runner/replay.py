@@ -0,0 +1,42 @@
+from typing import Any
+
+from simulation_runner.result_sink import read_results, latest_results, unit_key
+
+
+def _single(records: list[dict[str, Any]], field: str, path: str):
+    values = {record.get(field) for record in records}
+    if len(values) != 1:
+        raise ValueError(f"{path} mixes runs with different {field} values: {values}")
+    return values.pop()
+
+
+def recorded_run(path: str, goal_generators: dict[str, type]) -> tuple[int, int | None, list[tuple]]:
+    """Returns the seed, history window and grid configurations of a run recorded with --seed."""
+    records = read_results(path)
+    if not records:
+        raise ValueError(f"{path} has no recorded results")
+    seed = _single(records, "seed", path)
+    if seed is None:
+        raise ValueError(f"{path} was not recorded with --seed, so its model calls can't be matched up again")
+    history_window = _single(records, "history_window", path)
+    configurations = sorted({
+        (record["evaluator_model"], record["goal_generator"], record["agent_model"], record["difficulty"],
+         record["num_rounds"], record["num_simulations"])
+        for record in records
+    })
+    return seed, history_window, [(evaluator_model, goal_generators[goal_generator], agent_model, difficulty,
+                                   num_rounds, num_simulations)
+                                  for evaluator_model, goal_generator, agent_model, difficulty, num_rounds, num_simulations
+                                  in configurations]
+
+
+def compare_runs(recorded_path: str, replayed_path: str) -> tuple[int, int, int]:
+    """Counts the recorded conversations the replay reproduced exactly, reproduced differently and did not reproduce."""
+    def conversations(path):
+        return {unit_key(record): record["conversation"] for record in latest_results(read_results(path))
+                if record["conversation"][0].get("type") != "error"}
+
+    recorded, replayed = conversations(recorded_path), conversations(replayed_path)
+    identical = sum(replayed.get(unit) == conversation for unit, conversation in recorded.items())
+    missing = sum(unit not in replayed for unit in recorded)
+    return identical, len(recorded) - identical - missing, missing
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any
+
+DEFAULT_OUTPUT_PATH = "simulation_results/results.jsonl"
+
+
+class ResultSink:
+    """
+    Appends one compact JSON line per finished conversation to an append-only .jsonl file.
+    Records are queued without blocking the event loop. A writer task encodes and writes them in a worker
+    thread in batches, and fsyncs at most every fsync_interval seconds and on close.
+    """
+    def __init__(self, path: str = DEFAULT_OUTPUT_PATH, fsync_interval: float = 5.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.queue: asyncio.Queue[tuple[dict[str, Any], asyncio.Future] | None] = asyncio.Queue()
+        self.file = None
+        self.writer_task: asyncio.Task | None = None
+        self.last_fsync = time.monotonic()
+
+    async def start(self) -> "ResultSink":
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = await asyncio.to_thread(open, self.path, "a", encoding="utf-8")
+        self.writer_task = asyncio.create_task(self._write_loop())
+        return self
+
+    def write(self, record: dict[str, Any]) -> asyncio.Future:
+        """Queues a record. The returned future resolves once it has been written and flushed to the file."""
+        written = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((record, written))
+        return written
+
+    def _write_batch(self, records: list[dict[str, Any]], fsync: bool):
+        self.file.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    async def _write_loop(self):
+        closing = False
+        while not closing:
+            records = [await self.queue.get()]
+            while not self.queue.empty():
+                records.append(self.queue.get_nowait())
+            closing = None in records
+            records = [record for record in records if record is not None]
+            fsync = closing or time.monotonic() - self.last_fsync >= self.fsync_interval
+            try:
+                await asyncio.to_thread(self._write_batch, [record for record, _ in records], fsync)
+            except Exception as e:
+                for _, written in records:
+                    if not written.done():
+                        written.set_exception(e)
+                continue
+            if fsync:
+                self.last_fsync = time.monotonic()
+            for _, written in records:
+                if not written.done():
+                    written.set_result(None)
+
+    async def close(self):
+        if self.writer_task is None:
+            return
+        self.queue.put_nowait(None)
+        await self.writer_task
+        self.writer_task = None
+        await asyncio.to_thread(self.file.close)
+
+
+def read_results(path: str) -> list[dict[str, Any]]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a torn last line from a crash mid-write
+                    continue
+    return records
+
+
+def first_result(path: str) -> dict[str, Any] | None:
+    """The first record of a results file, whose run-level settings (seed, history_window, ...) the rest share."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    return json.loads(line)
+                except json.JSONDecodeError:
+                    return None
+    return None
+
+
+def unit_key(record: dict[str, Any]) -> tuple:
+    return (record["evaluator_model"], record["goal_generator"], record["agent_model"], record["difficulty"],
+            record["num_rounds"], record.get("replicate"))
+
+
+def latest_results(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    One record per simulation of a resumed run. A unit can be written twice, when a crash came between writing its
+    result and marking it done, or when it failed and was rerun. The last successful record wins, and an error
+    record is only kept for units that never succeeded. Records without a replicate are all kept.
+    """
+    latest: dict[tuple, dict[str, Any]] = {}
+    unkeyed = []
+    for record in records:
+        if record.get("replicate") is None:
+            unkeyed.append(record)
+            continue
+        key = unit_key(record)
+        failed = record["conversation"][0].get("type") == "error"
+        if not failed or key not in latest or latest[key]["conversation"][0].get("type") == "error":
+            latest[key] = record
+    return unkeyed + list(latest.values())
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import os
+
+# one simulation of the grid: (evaluator model, goal generator, agent model, difficulty, num rounds, replicate)
+Unit = tuple[str, str, str, str, int, int]
+
+
+def manifest_path(output_path: str) -> str:
+    return output_path + ".manifest"
+
+
+class RunManifest:
+    """
+    Durable record of the grid units whose conversation has been written to the results file, one JSON line each.
+    A unit is only marked done after its result is flushed, so resuming never skips a unit whose result was lost.
+    Failed simulations are not marked and run again on resume.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.completed: set[Unit] = set()
+        self.file = None
+
+    async def open(self, resume: bool) -> "RunManifest":
+        if resume and os.path.exists(self.path):
+            self.completed = await asyncio.to_thread(self._load)
+        self.file = await asyncio.to_thread(open, self.path, "a" if resume else "w", encoding="utf-8")
+        return self
+
+    def _load(self) -> set[Unit]:
+        completed = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    completed.add(tuple(json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    continue  # a torn last line from an interrupted run
+        return completed
+
+    def is_done(self, unit: Unit) -> bool:
+        return unit in self.completed
+
+    def _append(self, unit: Unit):
+        self.file.write(json.dumps(list(unit)) + "\n")
+        self.file.flush()
+
+    async def mark_done(self, unit: Unit):
+        self.completed.add(unit)
+        await asyncio.to_thread(self._append, unit)
+
+    def _close(self):
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    async def close(self):
+        if self.file is not None:
+            await asyncio.to_thread(self._close)
+            self.file = None
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from collections import Counter, deque
+from typing import Awaitable, Callable, Hashable
+
+# simulations in flight per process, model calls within them are still paced by the per-model rate limiters
+DEFAULT_CONCURRENCY = int(os.environ.get("SIMULATION_CONCURRENCY", 32))
+
+Job = Callable[[], Awaitable[None]]
+
+
+class SimulationScheduler:
+    """
+    One work queue of individual simulations for a whole grid, drained by a fixed pool of concurrency workers.
+    Each time a worker frees up it takes the next simulation from the group (model) with the fewest simulations
+    in flight, so models share the pool fairly, and within that group from the cell with the fewest simulations
+    started so far, so under-sampled cells fill up first and no cell is left to run on its own at the end.
+    """
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY):
+        self.concurrency = concurrency
+        self.pending: dict[Hashable, dict[Hashable, deque[Job]]] = {}
+        self.started: Counter[Hashable] = Counter()
+        self.in_flight: Counter[Hashable] = Counter()
+
+    def add(self, group: Hashable, cell: Hashable, job: Job):
+        self.pending.setdefault(group, {}).setdefault(cell, deque()).append(job)
+
+    def count_done(self, cell: Hashable, n: int = 1):
+        """Counts simulations of cell that finished before this run, e.g. on resume, towards its priority."""
+        self.started[cell] += n
+
+    def _next(self) -> tuple[Hashable, Job] | None:
+        if not self.pending:
+            return None
+        group = min(self.pending, key=lambda g: (self.in_flight[g], min(self.started[c] for c in self.pending[g])))
+        cells = self.pending[group]
+        cell = min(cells, key=lambda c: self.started[c])
+        job = cells[cell].popleft()
+        if not cells[cell]:
+            del cells[cell]
+            if not cells:
+                del self.pending[group]
+        self.started[cell] += 1
+        return group, job
+
+    async def _worker(self):
+        while (item := self._next()) is not None:
+            group, job = item
+            self.in_flight[group] += 1
+            try:
+                await job()
+            finally:
+                self.in_flight[group] -= 1
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
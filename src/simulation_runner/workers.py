@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import Counter
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable
+
+from tqdm import tqdm
+
+from model_calling.rate_limiter import set_rate_limit_share
+from model_calling.registry import set_default_cache
+from model_calling.response_cache import ResponseCache
+from simulation_runner.result_sink import ResultSink
+from simulation_runner.run_manifest import RunManifest, Unit, manifest_path
+from simulation_runner.scheduler import DEFAULT_CONCURRENCY
+
+
+class _PipeSink:
+    """Stands in for ResultSink in a worker, the coordinator does the actual writing."""
+    def __init__(self, messages: Connection):
+        self.messages = messages
+
+    def write(self, record: dict[str, Any]) -> asyncio.Future:
+        self.messages.send(("result", record))
+        sent = asyncio.get_running_loop().create_future()
+        sent.set_result(None)
+        return sent
+
+
+class _PipeManifest:
+    """Stands in for RunManifest in a worker. Units finished in earlier runs are known up front."""
+    def __init__(self, completed: set[Unit], messages: Connection):
+        self.completed = completed
+        self.messages = messages
+
+    def is_done(self, unit: Unit) -> bool:
+        return unit in self.completed
+
+    async def mark_done(self, unit: Unit):
+        self.completed.add(unit)
+        self.messages.send(("done", unit))
+
+
+class WorkerFailedError(Exception):
+    pass
+
+
+def _cell_models(cell: tuple) -> set[str]:
+    # evaluator and agent model of a grid configuration
+    return {cell[0], cell[2]}
+
+
+def shard(cells: list[tuple], n_workers: int) -> list[list[tuple]]:
+    """
+    Deals cells out to n_workers shards so the cells of each (evaluator, agent) model pair are spread as evenly as
+    possible, since each worker only gets a share of each model's rate limits.
+    """
+    by_models: dict[tuple, list[tuple]] = {}
+    for cell in cells:
+        by_models.setdefault((cell[0], cell[2]), []).append(cell)
+    shards: list[list[tuple]] = [[] for _ in range(n_workers)]
+    dealt = 0
+    for group in by_models.values():
+        for cell in group:
+            shards[dealt % n_workers].append(cell)
+            dealt += 1
+    return [cells for cells in shards if cells]
+
+
+def _worker_main(worker_id: int, run_grid: Callable, cells: list[tuple], completed: set[Unit],
+                 messages: Connection, concurrency: int, cache_path: str | None, replay_cache: bool,
+                 rate_shares: tuple[float, dict[str, float]], grid_settings: dict[str, Any]):
+    set_rate_limit_share(*rate_shares)
+    if cache_path is not None:
+        set_default_cache(ResponseCache(cache_path, replay=replay_cache))
+    try:
+        asyncio.run(run_grid(cells, sink=_PipeSink(messages), manifest=_PipeManifest(completed, messages),
+                             concurrency=concurrency, progress=False, **grid_settings))
+    except Exception:
+        logging.getLogger().exception(f"Simulation worker {worker_id} failed")
+        messages.send(("failed", None))
+    finally:
+        messages.close()
+
+
+async def run_sharded(run_grid: Callable, cells: list[tuple], n_workers: int, output_path: str, resume: bool = False,
+                      concurrency: int = DEFAULT_CONCURRENCY, cache_path: str | None = None, replay_cache: bool = False,
+                      **grid_settings):
+    """
+    Runs the grid's configurations in n_workers processes, each with its own event loop. Each worker runs its shard
+    of cells with run_grid, using a sink and manifest that send finished conversations and units back over its own
+    pipe, so a worker that dies mid-message can't block the others,
+    and grid_settings (e.g. history_window) are passed on to run_grid. This process, the coordinator, owns the
+    results file, the run manifest and the progress bar, so the output is the same as a single-process run.
+
+    A grid model's rate limits are split between the workers whose cells use it, other models (e.g. a routed judge)
+    between all workers. A model with fewer cells than there are workers therefore runs on fewer workers' shares,
+    its throughput capped at what those workers' simulations can use.
+    Raises WorkerFailedError once the others are done if a worker failed or died, the run can then be finished
+    with --resume.
+    """
+    shards = shard(cells, n_workers)
+    workers_per_model = Counter(model for cells in shards for model in set().union(*map(_cell_models, cells)))
+    sink = await ResultSink(output_path).start()
+    manifest = await RunManifest(manifest_path(output_path)).open(resume)
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    readers: dict[Connection, int] = {}
+    writers = []
+    for worker_id, worker_cells in enumerate(shards):
+        models = set().union(*map(_cell_models, worker_cells))
+        rate_shares = (1 / len(shards), {model: 1 / workers_per_model[model] for model in models})
+        reader, writer = context.Pipe(duplex=False)
+        readers[reader] = worker_id
+        writers.append(writer)
+        workers.append(context.Process(
+            target=_worker_main, daemon=True,
+            args=(worker_id, run_grid, worker_cells, manifest.completed, writer, concurrency, cache_path,
+                  replay_cache, rate_shares, grid_settings)))
+    bar = tqdm(desc="Simulations finished", initial=len(manifest.completed), position=0, leave=True)
+
+    failed = set()
+    last_write: asyncio.Future | None = None
+    try:
+        for worker in workers:
+            worker.start()
+        # only the workers hold the write ends now, so a pipe reads EOF once its worker has exited, however it exited
+        for writer in writers:
+            writer.close()
+        while readers:
+            for reader in await asyncio.to_thread(wait, list(readers)):
+                worker_id = readers[reader]
+                try:
+                    kind, payload = reader.recv()
+                except EOFError:
+                    del readers[reader]
+                    workers[worker_id].join()
+                    if workers[worker_id].exitcode != 0:
+                        logging.getLogger().error(f"Simulation worker {worker_id} exited with code {workers[worker_id].exitcode}")
+                        failed.add(worker_id)
+                    continue
+                if kind == "result":
+                    last_write = sink.write(payload)
+                    bar.update(1)
+                elif kind == "done":
+                    # a worker sends a unit's result before marking it done, and the sink writes in order
+                    await last_write
+                    await manifest.mark_done(tuple(payload))
+                elif kind == "failed":
+                    failed.add(worker_id)
+    finally:
+        for reader in readers:
+            reader.close()
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        await sink.close()
+        await manifest.close()
+        bar.close()
+    if failed:
+        unfinished = [cell for worker_id in sorted(failed) for cell in shards[worker_id]]
+        raise WorkerFailedError(f"{len(failed)} simulation worker(s) failed with {len(unfinished)} configuration(s) "
+                                f"possibly unfinished, run again with --resume to finish them")